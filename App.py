@@ -1,129 +1,91 @@
+import time
+_rerun_started = time.perf_counter()
+
 import streamlit as st
 from streamlit_lottie import st_lottie
-import requests
-import streamlit_authenticator as stauth
-from PIL import Image
 from streamlit_option_menu import option_menu
-import io
-from langchain_groq import ChatGroq
 import os
-from langchain_core.messages import HumanMessage, SystemMessage
-from langsmith import traceable
-import json
-from groq import Groq
-import pyttsx3
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from deep_translator import GoogleTranslator
-import fitz  # PyMuPDF
-from fpdf import FPDF
-import base64
+import uuid
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from dotenv import load_dotenv
-from email.message import EmailMessage
 
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from PIL import Image
-import torch
+# Les dépendances lourdes (fitz, fpdf, pyttsx3, deep_translator, smtplib, clients Groq)
+# sont importées à la demande, uniquement par les pages qui en ont besoin
+from resources import lazy_import, record_rerun, startup_report
+from translation_memory import LeverageStats
+from pdf_pipeline import open_pdf, iter_pdf_chunks, preview_text
+from groq_client import RateLimitedError
+from chat_history import ContextWindowManager
+from pdf_audio import join_audio
+from local_captioning import active_captioner
+from pipelines import Pipelines
+from jobs import JobManager
+from assets import flag, lottie, style_block
+from metrics import REGISTRY, metrics_server_from_env
+from tracing import get_tracer, traced
 
 # Load .env variables
 load_dotenv()
 
-# Configuration LangSmith
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGCHAIN_API_KEY")
-os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
-os.environ["LANGCHAIN_PROJECT"] = "LanguePro AI"
+# Traces échantillonnées vers LangSmith (LANGCHAIN_API_KEY) ou un fichier JSONL (TRACE_FILE),
+# export en arrière-plan ; taux par défaut TRACE_SAMPLE_RATE, par fonction TRACE_SAMPLE_RATES
+# (ex. "TextToAudio=0,SendContactEmail=0") ; sans configuration, aucune trace
 
 SENDER_EMAIL = os.environ.get("EMAIL_USER")
-SENDER_PASSWORD = os.environ.get("EMAIL_PASS")
-
-# Configuration Groq
-llm = ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY"), model_name="llama3-8b-8192")
-
-# LangSmith tracing
-def encode_image_to_base64(image_file):
-    image = Image.open(image_file).convert("RGB")
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-@traceable(name="TranslationChain")
-def translate_text(prompt):
-    return llm.invoke([HumanMessage(content=prompt)]).content
-
-from langsmith.run_helpers import traceable
-
-@traceable(name="TextToAudio")
-def generate_audio(text, lang):
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 150)
-    voices = engine.getProperty('voices')
-    voice_map = {"fr": voices[0], "en": voices[1] if len(voices) > 1 else voices[0]}
-    engine.setProperty('voice', voice_map.get(lang, voices[0]).id)
-    engine.save_to_file(text, "output_audio.mp3")
-    engine.runAndWait()
-
-
-client = Groq()
-# Fonction de génération de description d’image
-@traceable(name="ImageCaptioning")
-def generate_caption(uploaded_file):
-    # Lire l'image directement depuis l'objet UploadedFile
-    img_bytes = uploaded_file.read()
-    img_b64 = base64.b64encode(img_bytes).decode("utf-8")
-
-    messages = [
-        {"type": "text", "text": "Describe this image."},
-        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-    ]
-
-    response = client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",  # ou autre modèle
-        messages=[{"role": "user", "content": messages}]
-    )
 
-    return response.choices[0].message.content
+# Métriques locales : /metrics (Prometheus) et /metrics.json si METRICS_PORT est défini,
+# page « Métriques » si METRICS_ADMIN=1
+@st.cache_resource
+def get_metrics_server():
+    return metrics_server_from_env()
 
-    
-@traceable(name="PDFTranslation")
-def translate_pdf_text(text, source_lang, target_lang):
-    max_len = 4500  # Deep Translator limite ~5000, on prend un peu moins pour sécurité
-    chunks = [text[i:i+max_len] for i in range(0, len(text), max_len)]
-    translated = ""
-    for chunk in chunks:
-        translated += GoogleTranslator(source=source_lang, target=target_lang).translate(chunk) + "\n"
-    return translated
+get_metrics_server()
+METRICS_ADMIN = os.getenv("METRICS_ADMIN") == "1"
 
+# Pipelines (traduction, chatbot, audio, description d'images) : ressources construites au
+# premier usage et partagées par toutes les sessions (voir pipelines.py)
+@st.cache_resource
+def get_pipelines():
+    return Pipelines()
 
+pipelines = get_pipelines()
 
-@traceable(name="PDFToAudio")
-def read_pdf_to_audio(text):
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 150)
-    voices = engine.getProperty('voices')
-    engine.setProperty('voice', voices[0].id)
-    engine.save_to_file(text, "pdf_audio.mp3")
-    engine.runAndWait()
+# Moteurs de description : Groq (vision distante) ou BLIP local sur CPU
+CAPTION_BACKENDS = {"Groq (distant)": "groq", "BLIP local (CPU)": "blip"}
 
+# --- Tâches en arrière-plan : elles survivent aux reruns et à la navigation ---
+@st.cache_resource
+def get_job_manager():
+    return JobManager(
+        max_workers=int(os.getenv("JOB_WORKERS", "4")),
+        per_session=int(os.getenv("JOB_PER_SESSION", "2")),
+    )
 
-@traceable(name="SendContactEmail")
-def send_email(sender_email, sender_password, recipient_email, subject, body):
+def current_session_id():
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def submit_job(kind, fn, *args):
+    job_id = get_job_manager().submit(current_session_id(), kind, fn, *args)
+    st.info(f"⏳ Tâche {job_id} lancée : suivez-la dans le menu « Tâches ».")
+    return job_id
+
+# Boîte d'envoi durable (SQLite) vidée par un thread de fond qui garde la connexion SMTP
+# ouverte (smtplib n'est chargé qu'à la première utilisation de la page Contact)
+@st.cache_resource
+def get_email_outbox():
+    return lazy_import("email_outbox").outbox_from_env()
+
+@traced(name="SendContactEmail")
+def send_email(sender_email, recipient_email, subject, body):
+    # Mise en file seulement : rend l'identifiant du message sans attendre le serveur SMTP,
+    # ou None si le message ne peut pas être mis en file (EMAIL_USER absent, base illisible)
     try:
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = sender_email
-        msg["To"] = recipient_email
-        msg.set_content(body)
-
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(sender_email, sender_password)
-            smtp.send_message(msg)
-
-        return True
+        return get_email_outbox().enqueue(sender_email, recipient_email, subject, body)
     except Exception as e:
         print(f"Erreur : {e}")
-        return False
+        return None
 
 
 
@@ -132,37 +94,32 @@ def send_email(sender_email, sender_password, recipient_email, subject, body):
 # UI Streamlit
 st.set_page_config(page_title="LanguePro AI", layout="wide")
 
-def toast():
-    st.markdown("""
-    <style>
-    #custom-toast {
-    position: fixed;
-    top: 60px;
-    center: 20px;
-    background-color: #28a745;
-    color: white;
-    padding: 14px 22px;
-    border-radius: 10px;
-    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
-    font-size: 15px;
-    font-weight: 600;
-    z-index: 9999;
-    animation: fadeOut 4s forwards;
-    }
-
-    @keyframes fadeOut {
-    0% {opacity: 1;}
-    80% {opacity: 1;}
-    100% {opacity: 0;}
-    }
-    </style>
-    <div id="custom-toast">📡 LangSmith Monitoring Activé</div>
-    """, unsafe_allow_html=True)
+# Feuilles de style : regroupées et minifiées une fois par processus, émises en un seul bloc
+# par rerun (Streamlit retire de la page les éléments que le rerun n'a pas produits)
+TOAST_CSS = """
+#custom-toast {
+position: fixed;
+top: 60px;
+center: 20px;
+background-color: #28a745;
+color: white;
+padding: 14px 22px;
+border-radius: 10px;
+box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
+font-size: 15px;
+font-weight: 600;
+z-index: 9999;
+animation: fadeOut 4s forwards;
+}
 
-toast()
+@keyframes fadeOut {
+0% {opacity: 1;}
+80% {opacity: 1;}
+100% {opacity: 0;}
+}
+"""
 
-st.sidebar.markdown("""
-<style>
+SIDEBAR_CSS = """
 @keyframes pulse {
   0% {opacity: 0.4;}
   50% {opacity: 1;}
@@ -183,37 +140,48 @@ st.sidebar.markdown("""
   margin: 0 auto 10px auto;
   box-shadow: 0 4px 10px rgba(0,0,0,0.1);
 }
-</style>
-<div class="sidebar-center">
-  <div id="monitoring-indicator">🔎 Monitoring actif</div>
-</div>
-""", unsafe_allow_html=True)
+"""
 
+# Style global
+GLOBAL_CSS = """
+.block-container {
+    max-width: 90% !important;
+    padding-left: 2rem !important;
+    padding-right: 2rem !important;
+}
+.box {
+    background-color: #B0E0E6;
+    border: 1px solid #e0e0e0;
+    border-radius: 10px;
+    padding: 20px;
+    margin-bottom: 30px;
+    box-shadow: 0px 2px 10px rgba(0,0,0,0.05);
+}
+h3 {
+    display: flex;
+    align-items: center;
+    gap: 10px;
+    margin-bottom: 10px;
+}
+"""
 
+st.markdown(style_block(GLOBAL_CSS, SIDEBAR_CSS, TOAST_CSS), unsafe_allow_html=True)
 
-# Style global
-st.markdown("""
-    <style>
-        .block-container {
-            max-width: 90% !important;
-            padding-left: 2rem !important;
-            padding-right: 2rem !important;
-        }
-        .box {
-            background-color: #B0E0E6;
-            border: 1px solid #e0e0e0;
-            border-radius: 10px;
-            padding: 20px;
-            margin-bottom: 30px;
-            box-shadow: 0px 2px 10px rgba(0,0,0,0.05);
-        }
-        h3 {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            margin-bottom: 10px;
-        }
-    </style>
+# Notification affichée une seule fois par session, et seulement si les traces sont actives
+def toast():
+    if get_tracer().exporter is None or st.session_state.get("toast_shown"):
+        return
+    st.session_state.toast_shown = True
+    st.markdown('<div id="custom-toast">📡 LangSmith Monitoring Activé</div>', unsafe_allow_html=True)
+
+toast()
+
+# Indicateur affiché seulement quand les traces sont réellement exportées
+if get_tracer().exporter is not None:
+    st.sidebar.markdown("""
+<div class="sidebar-center">
+  <div id="monitoring-indicator">🔎 Monitoring actif</div>
+</div>
 """, unsafe_allow_html=True)
 
 
@@ -221,8 +189,10 @@ st.markdown("""
 with st.sidebar:
     selection = option_menu(
         menu_title="Menu",
-        options=["Dashboard", "Traduction", "Text-to-Audio", "Image-to-Text", "Traduction PDF","Chatbot", "PDF to Audio", "À propos", "Contact Us"],
-        icons=["check", "translate", "volume-up", "image", "file-earmark-text", "file-music", "info-circle", "envelope"],
+        options=["Dashboard", "Traduction", "Text-to-Audio", "Image-to-Text", "Traduction PDF","Chatbot", "PDF to Audio", "Tâches", "À propos", "Contact Us"]
+        + (["Métriques"] if METRICS_ADMIN else []),
+        icons=["check", "translate", "volume-up", "image", "file-earmark-text", "chat-dots", "file-music", "list-task", "info-circle", "envelope"]
+        + (["speedometer2"] if METRICS_ADMIN else []),
         menu_icon="globe",
         default_index=0,
         orientation="vertical",
@@ -243,15 +213,10 @@ with st.sidebar:
         }
     )
 
-toast()
 # Pages
 if selection == "Dashboard":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>🌎 LanguePro AI 🗣️</h1></div>""", unsafe_allow_html=True)
-    def load_lottie_file(filepath: str):
-        with open(filepath, "r") as f:
-            return json.load(f)
-    lottie_animation = load_lottie_file("animation.json")
+    lottie_animation = lottie("animation.json")
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.markdown("""<div style="display: flex; justify-content: center;">""", unsafe_allow_html=True)
@@ -268,99 +233,120 @@ if selection == "Dashboard":
     st.markdown("""<div class="box"> <h4>Bienvenue dans notre application LanguePro AI ! Sélectionnez une fonctionnalité dans le menu à gauche pour commencer.</h4></div>""", unsafe_allow_html=True)
 
 elif selection == "Traduction":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>🌍 LanguePro AI / Traduction</h1></div>""", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
         source_lang = st.selectbox("Langue source", ["Français", "Anglais", "Espagnol", "Allemand", "Arabe", "Chinois", "Portugais"])
         c1,c2,c3,c4= st.columns(4)
         with c1:
-            st.image("fran.jpg", width=50)
+            st.image(flag("fran.jpg", 50), width=50)
         with c2:
-            st.image("ang.jpg", width=50)
+            st.image(flag("ang.jpg", 50), width=50)
         with c3:
-            st.image("ar.jpg", width=50)  
+            st.image(flag("ar.jpg", 50), width=50)  
         with c4:
-            st.image("esp.jpg", width=50)
+            st.image(flag("esp.jpg", 50), width=50)
     
     with col2:
         target_lang = st.selectbox("Langue de sortie", ["Français", "Anglais", "Espagnol", "Allemand", "Arabe", "Chinois", "Portugais"])
         c1,c2,c3,c4= st.columns(4)
         with c1:
-            st.image("all.jpg", width=50)
+            st.image(flag("all.jpg", 50), width=50)
         with c2:
-            st.image("por.jpg", width=50)
+            st.image(flag("por.jpg", 50), width=50)
         with c3:
-            st.image("ita.jpg", width=50)
+            st.image(flag("ita.jpg", 50), width=50)
         with c4:
-            st.image("ch.jpg", width=50) 
+            st.image(flag("ch.jpg", 50), width=50) 
     text = st.text_area("Entrez le texte à traduire")
     if st.button("Traduire"):
-        prompt = f"Traduis du {source_lang} vers le {target_lang} : {text}"
-        result = translate_text(prompt)
-        st.success("Traduction réussie")
-        st.text_area("Résultat", value=result)
+        result_placeholder = st.empty()
+        try:
+            with result_placeholder.container():
+                result = st.write_stream(pipelines.translate_text_stream(text, target_lang, source_lang))
+            st.success("Traduction réussie")
+            result_placeholder.text_area("Résultat", value=result)
+        except RateLimitedError as e:
+            st.warning(f"⏳ {e}")
 
 elif selection == "Text-to-Audio":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>🔊 LanguePro AI/ Texte vers Audio</h1></div>""", unsafe_allow_html=True)
 
     source_lang_audio = st.selectbox("Langue source", ["Français", "Anglais", "Espagnol", "Allemand", "Arabe", "Chinois", "Portugais"])
     text_audio = st.text_area("Entrez le texte à convertir en audio")
     if st.button("Générer Audio"):
-        generate_audio(text_audio, source_lang_audio)
-        st.audio("output_audio.mp3")
+        with st.spinner("⏳ Synthèse en cours..."):
+            audio_bytes = pipelines.generate_audio(text_audio, source_lang_audio)
+        st.audio(audio_bytes, format="audio/wav")
     
 # --- Image to Text ---
 elif selection == "Image-to-Text":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>🖼️ LanguePro AI/ Image vers Texte</h1></div>""", unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("📤 Choisissez une image", type=["jpg", "jpeg", "png"])
+    uploaded_files = st.file_uploader("📤 Choisissez une ou plusieurs images", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+    caption_backend = CAPTION_BACKENDS[st.radio("Moteur de description", list(CAPTION_BACKENDS), horizontal=True)]
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown("<h2 style='text-decoration: underline; color: sky-blue;'>🔍 Aperçu de l'image </h2>", unsafe_allow_html=True)
-        if uploaded_file:
-            st.image(uploaded_file, caption="🖼️ Image chargée", use_container_width=True)
+        if uploaded_files:
+            for uploaded_file in uploaded_files:
+                st.image(uploaded_file, caption=f"🖼️ {uploaded_file.name}", use_container_width=True)
         else:
             st.warning("Veuillez charger une image")
     with col2:
 
         st.markdown("<h2 style='text-decoration: underline; color:sky-blue;'>📝 Description de l'image </h2>", unsafe_allow_html=True)
 
-        if uploaded_file:
+        if uploaded_files:
             
 
+            if st.button("⏳ Décrire en arrière-plan"):
+                images = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+                submit_job("Description d'images", pipelines.caption_job, images, caption_backend)
+
             if st.button("Générer la description"):
                 with st.spinner("⏳ Génération en cours..."):
                     try:
-                        description = generate_caption(uploaded_file)
-                        st.session_state["description"] = description  # Sauvegarde dans session_state
+                        captions = pipelines.generate_captions([f.getvalue() for f in uploaded_files], caption_backend)
+                        # Sauvegarde dans session_state
+                        st.session_state["descriptions"] = [
+                            (uploaded_file.name, caption) for uploaded_file, caption in zip(uploaded_files, captions)
+                        ]
                     except Exception as e:
                         st.error(f"❌ Erreur : {str(e)}")
-            # Affiche la description si elle existe
-            if "description" in st.session_state:
+            # Affiche les descriptions si elles existent
+            if "descriptions" in st.session_state:
                 st.success("✅ Description en anglais :")
-                st.markdown(f"**{st.session_state['description']}**")
+                for name, description in st.session_state["descriptions"]:
+                    st.markdown(f"*{name}* : **{description}**")
                 st.markdown("-------------------")
-                # Sélecteur de langue
+                # Sélecteur de langues : toutes les traductions partent en une seule requête
                 lang_options = ["Français", "Anglais", "Espagnol", "Allemand", "Arabe", "Chinois", "Portugais"]
-                selected_lang = st.selectbox("Choisissez la langue de traduction", lang_options)
-
-                if selected_lang:
-                    prompt = f"Traduis ce texte en {selected_lang} : {st.session_state['description']}"
-                    translated_text = translate_text(prompt)
-                    st.success(f"📌 Traduction en {selected_lang} :")
-                    st.markdown(f"**{translated_text}**")
+                selected_langs = st.multiselect("Choisissez les langues de traduction", lang_options, default=["Français"])
+
+                if selected_langs:
+                    descriptions = [description for _, description in st.session_state["descriptions"]]
+                    translations = pipelines.translate_texts(descriptions, selected_langs)
+                    for selected_lang in selected_langs:
+                        st.success(f"📌 Traduction en {selected_lang} :")
+                        for (name, _), translation in zip(st.session_state["descriptions"], translations):
+                            st.markdown(f"*{name}* : **{translation[selected_lang]}**")
+
+            # Performances des deux moteurs, côte à côte
+            with st.expander("⏱️ Performances des moteurs"):
+                report = {"Groq (distant)": pipelines.remote_caption_stats().report()}
+                blip = active_captioner()
+                if blip is not None:
+                    report["BLIP local (CPU)"] = blip.report()
+                st.json(report)
         else:
             st.warning("📤 Veuillez charger une image.")
 
 # --- Traduction PDF ---
 elif selection == "Traduction PDF":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>📄 LanguePro AI / Traduction PDF</h1></div>""", unsafe_allow_html=True)
 
-    uploaded_pdf = st.file_uploader("📤 Téléversez un fichier PDF de moins de 5000 caractères", type=["pdf"])
+    uploaded_pdf = st.file_uploader("📤 Téléversez un fichier PDF à traduire", type=["pdf"])
 
     col1, col2 = st.columns(2)
     with col1:
@@ -370,46 +356,37 @@ elif selection == "Traduction PDF":
 
     if uploaded_pdf:
         st.success("Fichier PDF chargé avec succès !")
+        keep_layout = st.checkbox("Conserver la mise en page (traduction bloc par bloc)")
+        if st.button("⏳ Traduire en arrière-plan"):
+            submit_job("Traduction PDF", pipelines.pdf_translation_job, uploaded_pdf.getvalue(), source_lang, target_lang,
+                       keep_layout)
         if st.button("Traduire le PDF"):
             try:
-                # Lecture du contenu PDF
-                pdf_bytes = uploaded_pdf.read()
-                with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                    full_text = ""
-                    for page in doc:
-                        full_text += page.get_text()
-
-                # Vérification de la longueur pour éviter l'erreur > 5000 caractères
-                if len(full_text) > 5000:
-                    st.error("🚫 Le contenu du PDF dépasse la limite de 5000 caractères.")
-                    st.stop()
-
-                # Traduction
-                translated_text = translate_pdf_text(full_text, source_lang, target_lang)
-
-                # Affichage
-                st.markdown("### 📝 Texte traduit :")
-                st.text_area("Texte traduit", value=translated_text, height=300)
-
-                # Génération d’un PDF avec police Unicode
-# Génération d’un PDF avec police Unicode
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_auto_page_break(auto=True, margin=15)
-                pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)  # Assure-toi que ce fichier est dans le même dossier
-                pdf.set_font('DejaVu', '', 12)
-
-                for line in translated_text.split('\n'):
-                    pdf.multi_cell(0, 10, line)
-
-                # ✅ Exporter en tant que chaîne (format bytes)
-                pdf_bytes = pdf.output(dest='S').encode('latin1')  # Convertir en bytes
-                pdf_output = io.BytesIO(pdf_bytes)  # Stocker dans un buffer
+                if keep_layout:
+                    # Blocs uniques traduits une seule fois et réécrits à leur place d'origine
+                    pdf_bytes, layout_stats = pipelines.translate_pdf_with_layout(uploaded_pdf, source_lang, target_lang)
+                    st.markdown("### 📊 Blocs traduits :")
+                    st.json(layout_stats)
+                else:
+                    # Extraction et traduction en flux (pages → blocs → morceaux alignés sur les phrases)
+                    leverage = LeverageStats()
+                    translated_text = pipelines.translate_pdf_document(uploaded_pdf, source_lang, target_lang, leverage=leverage)
+
+                    # Affichage
+                    st.markdown("### 📝 Texte traduit :")
+                    st.text_area("Texte traduit", value=translated_text, height=300)
+
+                    # Part du document reprise de la mémoire (révisions d'un document déjà traduit)
+                    st.markdown("### ♻️ Mémoire de traduction :")
+                    st.json(leverage.as_dict())
+
+                    # Génération d’un PDF avec police Unicode (police chargée une fois par processus)
+                    pdf_bytes = pipelines.pdf_renderer().render(translated_text)
 
                 # ✅ Bouton de téléchargement
                 st.download_button(
                     label="📥 Télécharger la traduction PDF",
-                    data=pdf_output,
+                    data=pdf_bytes,
                     file_name="pdf_traduit.pdf",
                     mime="application/pdf"
                 )
@@ -422,13 +399,19 @@ elif selection == "Traduction PDF":
 
 
 elif selection == "Chatbot":
-    toast()
     st.title("🤖 Chatbot IA - Propulsé par Groq + LLaMA 3")
     # Initialiser l'historique des messages
     if "messages" not in st.session_state:
         st.session_state.messages = [
             SystemMessage(content="Tu es un assistant IA utile, amical et précis.")
         ]
+    # Gestion du budget de tokens envoyé à Groq (contexte de 8192 tokens)
+    if "context_manager" not in st.session_state:
+        st.session_state.context_manager = ContextWindowManager(
+            max_prompt_tokens=int(os.getenv("CHAT_MAX_PROMPT_TOKENS", "6000")),
+            keep_recent=int(os.getenv("CHAT_KEEP_RECENT_MESSAGES", "6")),
+            summarizer=pipelines.summarize_history,
+        )
     # Afficher l'historique dans l'interface
     for msg in st.session_state.messages[1:]:  # ignorer le message système pour l'affichage
         with st.chat_message("user" if isinstance(msg, HumanMessage) else "assistant"):
@@ -443,66 +426,142 @@ elif selection == "Chatbot":
         # Générer la réponse avec le modèle Groq
         with st.chat_message("assistant"):
             try:
-                response = llm(st.session_state.messages)
-                st.markdown(response.content)
-                st.session_state.messages.append(response)
+                context_manager = st.session_state.context_manager
+                request_messages = context_manager.build_prompt(st.session_state.messages)
+                response = st.write_stream(pipelines.chat_stream(request_messages))
+                st.session_state.messages.append(AIMessage(content=response))
+                metrics = context_manager.last_metrics()
+                st.caption(
+                    f"Requête : {metrics['prompt_tokens']} tokens, {metrics['sent_messages']} messages "
+                    f"({metrics['summarized_messages']} résumés)"
+                )
+            except RateLimitedError as e:
+                st.warning(f"⏳ {e}")
             except Exception as e:
                 st.error(f"Erreur lors de l'appel au chatbot : {e}")
 
 
 elif selection == "PDF to Audio":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>🔊 LanguePro AI/ PDF vers Audio</h1></div>""", unsafe_allow_html=True)
 
     uploaded_pdf = st.file_uploader("📤 Téléversez un fichier PDF à lire à haute voix", type=["pdf"], key="audio_pdf")
 
     if uploaded_pdf is not None:
-        with fitz.open(stream=uploaded_pdf.read(), filetype="pdf") as doc:
-            full_text = "".join([page.get_text() for page in doc])
+        with open_pdf(uploaded_pdf) as doc:
+            extract_preview = preview_text(doc)
 
         st.subheader("📑 Aperçu du texte extrait")
-        st.text_area("Texte extrait du PDF", full_text, height=200)
+        st.text_area("Texte extrait du PDF", extract_preview, height=200)
+
+        if st.button("⏳ Lire en arrière-plan"):
+            submit_job("PDF vers audio", pipelines.pdf_audio_job, uploaded_pdf.getvalue())
 
         if st.button("🔊 Lire le PDF"):
             try:
-                read_pdf_to_audio(full_text)
+                # Chaque segment est lisible dès qu'il est prêt
+                segments_audio = []
+                segments_box = st.expander("🎧 Segments audio", expanded=True)
+                with open_pdf(uploaded_pdf) as doc:
+                    segments = iter_pdf_chunks(doc, max_chars=pipelines.pdf_audio_segment_chars)
+                    for index, segment_audio in enumerate(pipelines.read_pdf_to_audio(segments), start=1):
+                        segments_audio.append(segment_audio)
+                        with segments_box:
+                            st.caption(f"Segment {index}")
+                            st.audio(segment_audio, format="audio/wav")
+                audio_bytes = join_audio(segments_audio)
 
                 st.success("✅ Audio généré avec succès !")
-                st.audio("pdf_audio.mp3")
-
-                with open("pdf_audio.mp3", "rb") as f:
-                    st.download_button(
-                        label="📥 Télécharger le fichier audio",
-                        data=f,
-                        file_name="pdf_audio.mp3",
-                        mime="audio/mpeg"
-                    )
+                st.audio(audio_bytes, format="audio/wav")
+
+                st.download_button(
+                    label="📥 Télécharger le fichier audio",
+                    data=audio_bytes,
+                    file_name="pdf_audio.wav",
+                    mime="audio/wav"
+                )
             except Exception as e:
                 st.error(f"❌ Erreur lors de la lecture du PDF : {e}")
 
 
+# --- Tâches en arrière-plan ---
+elif selection == "Tâches":
+    st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>⏳ LanguePro AI / Tâches</h1></div>""", unsafe_allow_html=True)
+    st.button("🔄 Actualiser")
+
+    job_manager = get_job_manager()
+    results = st.session_state.setdefault("job_results", {})
+    jobs = job_manager.list(current_session_id())
+    if not jobs and not results:
+        st.info("Aucune tâche en cours.")
+
+    for job in jobs:
+        with st.container(border=True):
+            st.markdown(f"**{job['kind']}** · `{job['id']}` · {job['status']} · {job['elapsed_s']} s")
+            if job["total"]:
+                st.progress(min(1.0, job["done"] / job["total"]), text=f"{job['done']}/{job['total']} {job['unit']}")
+            elif job["done"]:
+                st.caption(f"{job['done']} {job['unit']} traités")
+            if job["status"] == "queued" and st.button("Annuler", key=f"cancel_{job['id']}"):
+                job_manager.cancel(job["id"])
+            if job["status"] == "failed":
+                st.error(job["error"])
+            if job["status"] == "cancelled" and st.button("Retirer", key=f"dismiss_{job['id']}"):
+                job_manager.dismiss(job["id"])
+                st.rerun()
+            if job["status"] in ("done", "failed") and st.button("Récupérer", key=f"fetch_{job['id']}"):
+                # La tâche (résultat ou erreur) est retirée du gestionnaire et gardée dans la session
+                fetched = job_manager.fetch(job["id"])
+                if fetched is not None:
+                    results[job["id"]] = fetched
+                st.rerun()
+
+    for job_id, fetched in list(results.items()):
+        result = fetched["result"] or {}
+        with st.container(border=True):
+            st.markdown(f"**{fetched['kind']}** · `{job_id}` · {fetched['status']}")
+            if fetched["error"]:
+                st.error(fetched["error"])
+            if "pdf" in result:
+                if "text" in result:
+                    st.text_area("Texte traduit", value=result["text"], height=200, key=f"text_{job_id}")
+                if "layout" in result:
+                    st.caption(f"📊 Blocs traduits : {result['layout']}")
+                st.download_button("📥 Télécharger la traduction PDF", data=result["pdf"],
+                                   file_name="pdf_traduit.pdf", mime="application/pdf", key=f"pdf_{job_id}")
+                if "leverage" in result:
+                    st.caption(f"♻️ Mémoire de traduction : {result['leverage']}")
+            if "audio" in result:
+                st.audio(result["audio"], format="audio/wav")
+                st.download_button("📥 Télécharger le fichier audio", data=result["audio"],
+                                   file_name="pdf_audio.wav", mime="audio/wav", key=f"audio_{job_id}")
+            for name, caption in result.get("captions", []):
+                st.markdown(f"*{name}* : **{caption}**")
+            if st.button("Retirer", key=f"drop_{job_id}"):
+                del results[job_id]
+                st.rerun()
+
+
 # --- À propos ---
 elif selection == "À propos":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>💡 À propos de LanguePro AI</h1></div>""", unsafe_allow_html=True)    
 
     c1,c2,c3,c4,c5,c6,c7,c8= st.columns(8)
     with c1:
-        st.image("fran.jpg", width=75)
+        st.image(flag("fran.jpg", 75), width=75)
     with c2:
-        st.image("ang.jpg", width=75)
+        st.image(flag("ang.jpg", 75), width=75)
     with c3:
-        st.image("ar.jpg", width=75)  
+        st.image(flag("ar.jpg", 75), width=75)  
     with c4:    
-        st.image("esp.jpg", width=75)
+        st.image(flag("esp.jpg", 75), width=75)
     with c5:
-        st.image("all.jpg", width=75)  
+        st.image(flag("all.jpg", 75), width=75)  
     with c6:    
-        st.image("ita.jpg", width=75)
+        st.image(flag("ita.jpg", 75), width=75)
     with c7:
-        st.image("por.jpg", width=75)
+        st.image(flag("por.jpg", 75), width=75)
     with c8:
-        st.image("ch.jpg", width=75)
+        st.image(flag("ch.jpg", 75), width=75)
     st.markdown("""
     <div class="box">
     <h3>🎯Objectif</h3>
@@ -584,7 +643,6 @@ elif selection == "À propos":
     
 
 elif selection == "Contact Us":
-    toast()
     st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>📧 Contactez-nous</h1></div>""", unsafe_allow_html=True)    
     st.markdown("""
     <div style="background-color: #B0E0E6; border-radius: 15px; padding: 20px; 
@@ -601,12 +659,65 @@ elif selection == "Contact Us":
     message = st.text_area("Message")
     if st.button("Envoyer"):
         if email and subject and message:
-            success = send_email(SENDER_EMAIL, SENDER_PASSWORD, SENDER_EMAIL, f"De {email} : {subject}", message)
-            if success:
-                st.success("Message envoyé avec succès !")
-            else:
+            message_id = send_email(SENDER_EMAIL, SENDER_EMAIL, f"De {email} : {subject}", message)
+            if message_id is None:
                 st.error("Échec de l'envoi.")
+            else:
+                st.session_state.setdefault("contact_messages", []).append(message_id)
         else:
             st.warning("Tous les champs sont requis.")
 
-    st.info("""Par Hiroshi Yewo / IA""")
\ No newline at end of file
+    # Suivi des messages de cette session
+    for message_id in st.session_state.get("contact_messages", []):
+        delivery = get_email_outbox().status(message_id)
+        if delivery is None:
+            continue
+        if delivery["status"] == "sent":
+            st.success("Message envoyé avec succès !")
+        elif delivery["status"] == "failed":
+            st.error(f"Échec de l'envoi : {delivery['last_error']}")
+        else:
+            retry = f" (nouvelle tentative après : {delivery['last_error']})" if delivery["attempts"] else ""
+            st.info(f"📨 Message en file d'envoi{retry}")
+    if st.session_state.get("contact_messages"):
+        st.button("🔄 Actualiser le statut")
+
+    st.info("""Par Hiroshi Yewo / IA""")
+
+# --- Métriques (administration) ---
+elif selection == "Métriques":
+    st.markdown("""<div style='text-align: center;'><h1 style='text-decoration: underline; color: #339CFF;'>📈 LanguePro AI / Métriques</h1></div>""", unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("🔄 Actualiser")
+    with col2:
+        if st.button("🗑️ Remettre à zéro"):
+            REGISTRY.reset()
+    snapshot = REGISTRY.snapshot()
+    st.markdown("### ⏱️ Étapes")
+    st.dataframe([{"étape": name, **row} for name, row in REGISTRY.stage_summary().items()],
+                 use_container_width=True)
+    st.markdown("### 🔢 Compteurs")
+    st.dataframe([{"nom": c["name"], **c["labels"], "valeur": c["value"]} for c in snapshot["counters"]],
+                 use_container_width=True)
+    with st.expander("Passerelle Groq, caches et traces"):
+        exporter = get_tracer().exporter
+        st.json({"groq": pipelines.gateway().report(), "traductions": pipelines.translation_cache().stats(),
+                 "mémoire de traduction": pipelines.translation_memory().stats(),
+                 "audio": pipelines.audio_cache().report(),
+                 "traces": exporter.stats if exporter is not None else "désactivées"})
+    st.download_button("📥 Export Prometheus", data=REGISTRY.to_prometheus(), file_name="metrics.txt", mime="text/plain")
+    st.download_button("📥 Export JSON", data=REGISTRY.to_json(), file_name="metrics.json", mime="application/json")
+
+# Coût de ce rerun (affiché si LANGUEPRO_RERUN_TIMING=1 ou METRICS_ADMIN=1), et rapport
+# de démarrage si demandé (LANGUEPRO_STARTUP_REPORT=1)
+rerun_seconds = time.perf_counter() - _rerun_started
+record_rerun(rerun_seconds)
+REGISTRY.observe("stage_seconds", rerun_seconds, stage="rerun", page=selection)
+if METRICS_ADMIN or os.getenv("LANGUEPRO_RERUN_TIMING") == "1":
+    report = startup_report()
+    st.sidebar.caption(f"⏱️ Rerun : {rerun_seconds * 1000:.1f} ms · médiane {report['rerun_p50_ms']} ms "
+                       f"sur {report['reruns']} reruns")
+if os.getenv("LANGUEPRO_STARTUP_REPORT") == "1":
+    with st.sidebar.expander("⏱️ Démarrage"):
+        st.json(startup_report())
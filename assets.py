@@ -0,0 +1,46 @@
+import io
+import json
+import re
+from functools import lru_cache
+
+from resources import lazy_import, timed
+
+
+# Fichiers statiques chargés et préparés une fois par processus : Streamlit ré-exécute
+# App.py à chaque interaction, sans ce cache chaque rerun relit et ré-analyse les fichiers
+
+@lru_cache(maxsize=None)
+def lottie(path):
+    with timed(f"asset {path}"), open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Drapeau réduit à sa taille d'affichage (x2 pour les écrans haute densité)
+@lru_cache(maxsize=None)
+def flag(path, width, scale=2, quality=85):
+    Image = lazy_import("PIL.Image")
+    with timed(f"asset {path}@{width}"):
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            target = width * scale
+            if image.width > target:
+                image = image.resize((target, round(image.height * target / image.width)), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+_CSS_COMMENTS = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACES = re.compile(r"\s*([{}:;,])\s*")
+
+
+def minify_css(css):
+    css = _CSS_COMMENTS.sub("", css)
+    css = _CSS_SPACES.sub(r"\1", " ".join(css.split()))
+    return css.replace(";}", "}").strip()
+
+
+# Un seul bloc <style> pour toute la page, construit une fois par processus
+@lru_cache(maxsize=None)
+def style_block(*stylesheets):
+    return "<style>" + "".join(minify_css(css) for css in stylesheets) + "</style>"
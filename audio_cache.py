@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from languages import language_code
+from metrics import inc, set_gauge, stage
+from pdf_audio import join_audio
+from pdf_pipeline import SENTENCE_END
+from translation_cache import normalize_text
+
+
+# Audio synthétisé phrase par phrase et gardé sur disque : après la modification d'une
+# phrase, seules les phrases nouvelles ou changées repassent par le moteur TTS, le reste
+# est relu depuis le cache puis assemblé
+
+def split_sentences(text):
+    sentences = []
+    for line in text.split("\n"):
+        sentences.extend(s for s in SENTENCE_END.split(line.strip()) if s.strip())
+    return sentences
+
+
+def segment_key(voice, rate, lang, sentence):
+    normalized = normalize_text(sentence)
+    raw = f"{voice}|{rate}|{language_code(lang) or lang}|{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioSegmentCache:
+    # Un fichier par phrase ; éviction LRU dès que la taille totale dépasse max_bytes.
+    # L'ordre d'accès est reconstruit au démarrage à partir des dates de modification
+    def __init__(self, directory="audio_cache", max_bytes=200 * 1024 * 1024, suffix=".wav"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith(suffix):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name[:-len(suffix)], stat.st_size))
+            elif name.endswith(".tmp"):
+                os.remove(os.path.join(directory, name))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                inc("cache_lookups_total", cache="audio", result="miss")
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            # Date de modification = dernier accès, pour l'ordre LRU au prochain démarrage
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.stats["misses"] += 1
+            inc("cache_lookups_total", cache="audio", result="miss")
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        inc("cache_lookups_total", cache="audio", result="hit")
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        set_gauge("audio_cache_bytes", self._size)
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, "segments": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+
+
+# Synthèse incrémentale : les phrases absentes du cache partent ensemble au moteur (submit
+# rend un Future, comme TTSWorker.submit), chaque phrase distincte une seule fois.
+# voice : identifiant de la voix réellement utilisée (TTSWorker.voice_id), pour qu'un
+# changement de voix installée ne relise pas l'audio d'une autre voix
+def synthesize_incremental(text, lang, submit, cache, voice=None, rate=150):
+    sentences = split_sentences(text)
+    if not sentences:
+        return b""
+    keys = [segment_key(voice, rate, lang, sentence) for sentence in sentences]
+    audio = {}
+    pending = {}
+    for key, sentence in zip(keys, sentences):
+        if key in audio or key in pending:
+            continue
+        data = cache.get(key)
+        if data is not None:
+            audio[key] = data
+        else:
+            pending[key] = submit(sentence, lang, rate)
+    for key, future in pending.items():
+        audio[key] = future.result()
+        cache.set(key, audio[key])
+    inc("tts_segments_total", len(pending), result="synthesized")
+    inc("tts_segments_total", len(sentences) - len(pending), result="reused")
+    with stage("audio_join"):
+        return join_audio(audio[key] for key in keys)
+
+
+def audio_cache_from_env():
+    return AudioSegmentCache(
+        directory=os.getenv("AUDIO_CACHE_DIR", "audio_cache"),
+        max_bytes=int(float(os.getenv("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024),
+    )
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chunk_translation import ChunkTranslationEngine
+from pdf_pipeline import iter_pdf_chunks, open_pdf
+from pdf_renderer import PDFRenderer
+from resources import lazy_import
+from stub_backends import stub_translator_factory
+
+
+# Traduction de PDF en masse, sans Streamlit :
+#   python batch_translate.py documents/ -o traductions/ --source fr --target en --workers 4
+#   python batch_translate.py --manifest liste.txt -o traductions/ --backend stub
+# Chaque morceau traduit est ajouté au point de reprise du document : une exécution
+# interrompue reprend là où elle s'est arrêtée sans retraduire les morceaux déjà faits
+
+
+# État propre à chaque processus du pool (moteur de traduction et rendu PDF)
+_engine = None
+_renderer = None
+
+
+def _translator_factory(backend, stub_latency):
+    if backend == "stub":
+        return stub_translator_factory(stub_latency)
+    if backend == "marian":
+        from marian_translation import marian_from_env
+        marian = marian_from_env()
+        return lambda source, target: marian.bind(source, target)
+    GoogleTranslator = lazy_import("deep_translator").GoogleTranslator
+    return lambda source, target: GoogleTranslator(source=source, target=target)
+
+
+def _init_worker(backend, threads, retries, stub_latency, font_path):
+    global _engine, _renderer
+    _engine = ChunkTranslationEngine(
+        _translator_factory(backend, stub_latency),
+        max_workers=threads,
+        max_retries=0 if backend == "marian" else retries,
+    )
+    _renderer = PDFRenderer(font_path)
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def document_key(path, source_lang, target_lang, max_chars, backend):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(f"|{source_lang}|{target_lang}|{max_chars}|{backend}".encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+
+def load_checkpoint(path):
+    # Une ligne JSON par morceau ; une dernière ligne tronquée (arrêt brutal) est ignorée
+    # puis retirée du fichier, sinon l'ajout suivant s'y collerait et serait perdu
+    done = {}
+    if not os.path.exists(path):
+        return done
+    complete = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete += len(line)
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[entry["index"]] = (entry["hash"], entry["text"])
+    if complete < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(complete)
+    return done
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def translate_document(path, output_base, checkpoint_base, source_lang, target_lang, max_chars):
+    started = time.perf_counter()
+    stats = {"path": path, "status": "done", "pages": 0, "chunks": 0, "resumed_chunks": 0, "chars": 0}
+    marker = f"{checkpoint_base}.done.json"
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            return {**json.load(f), "status": "skipped", "seconds": 0.0}
+
+    with open_pdf(path) as doc:
+        stats["pages"] = doc.page_count
+        chunks = list(iter_pdf_chunks(doc, max_chars=max_chars))
+    stats["chunks"] = len(chunks)
+    stats["chars"] = sum(len(chunk) for chunk in chunks)
+
+    checkpoint = f"{checkpoint_base}.jsonl"
+    done = load_checkpoint(checkpoint)
+    hashes = [_digest(chunk) for chunk in chunks]
+    todo = [i for i, chunk in enumerate(chunks) if done.get(i, (None,))[0] != hashes[i]]
+    stats["resumed_chunks"] = len(chunks) - len(todo)
+
+    with open(checkpoint, "a", encoding="utf-8") as f:
+        translated = _engine.translate_stream((chunks[i] for i in todo), source_lang, target_lang)
+        for index, text in zip(todo, translated):
+            f.write(json.dumps({"index": index, "hash": hashes[index], "text": text}, ensure_ascii=False) + "\n")
+            f.flush()
+            done[index] = (hashes[index], text)
+
+    translated_text = "\n".join(done[i][1] for i in range(len(chunks)))
+    os.makedirs(os.path.dirname(output_base) or ".", exist_ok=True)
+    _write_atomic(f"{output_base}.txt", translated_text.encode("utf-8"))
+    _write_atomic(f"{output_base}.pdf", _renderer.render(translated_text))
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["output"] = f"{output_base}.pdf"
+    _write_atomic(marker, json.dumps(stats, ensure_ascii=False).encode("utf-8"))
+    os.remove(checkpoint)
+    return stats
+
+
+def collect_inputs(inputs, manifest=None):
+    paths = []
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(line)
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)))
+        else:
+            paths.append(item)
+    # Dédoublonnage en gardant l'ordre
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def run_batch(paths, output_dir, source_lang, target_lang, workers=None, threads=4, backend="google",
+              retries=3, max_chars=4500, stub_latency=0.0, font_path="DejaVuSans.ttf", log=print):
+    checkpoints = os.path.join(output_dir, ".checkpoints")
+    os.makedirs(checkpoints, exist_ok=True)
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                             initargs=(backend, threads, retries, stub_latency, font_path)) as pool:
+        futures = {}
+        for path in paths:
+            relative = os.path.splitext(os.path.relpath(path, root))[0]
+            output_base = os.path.join(output_dir, f"{relative}.{target_lang}")
+            key = document_key(path, source_lang, target_lang, max_chars, backend)
+            checkpoint_base = os.path.join(checkpoints, f"{os.path.basename(relative)}-{key}")
+            futures[pool.submit(translate_document, path, output_base, checkpoint_base,
+                                source_lang, target_lang, max_chars)] = path
+        for future in as_completed(futures):
+            try:
+                stats = future.result()
+            except Exception as e:
+                stats = {"path": futures[future], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            results.append(stats)
+            log(f"[{len(results)}/{len(paths)}] {stats['status']:>7} {stats['path']}"
+                + (f" ({stats['error']})" if "error" in stats else ""))
+    return summarize(results, time.perf_counter() - started)
+
+
+def summarize(results, elapsed):
+    processed = [r for r in results if r["status"] == "done"]
+    pages = sum(r["pages"] for r in processed)
+    chars = sum(r["chars"] for r in processed)
+    return {
+        "documents": len(results),
+        "done": len(processed),
+        "skipped": sum(r["status"] == "skipped" for r in results),
+        "failed": sum(r["status"] == "failed" for r in results),
+        "pages": pages,
+        "chunks_translated": sum(r["chunks"] - r["resumed_chunks"] for r in processed),
+        "chunks_resumed": sum(r["resumed_chunks"] for r in processed),
+        "elapsed_s": round(elapsed, 2),
+        "documents_per_s": round(len(processed) / elapsed, 3) if elapsed else None,
+        "pages_per_s": round(pages / elapsed, 2) if elapsed else None,
+        "chars_per_s": round(chars / elapsed, 1) if elapsed else None,
+        "failures": [{"path": r["path"], "error": r["error"]} for r in results if r["status"] == "failed"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Traduction de PDF en masse avec reprise sur incident")
+    parser.add_argument("inputs", nargs="*", help="fichiers PDF ou dossiers (parcourus récursivement)")
+    parser.add_argument("--manifest", help="fichier texte : un chemin de PDF par ligne")
+    parser.add_argument("-o", "--output", required=True, help="dossier de sortie (PDF, texte, points de reprise)")
+    parser.add_argument("--source", default="auto")
+    parser.add_argument("--target", default="en")
+    parser.add_argument("--backend", choices=["google", "marian", "stub"], default="google")
+    parser.add_argument("--workers", type=int, default=None, help="processus (défaut : nombre de CPU)")
+    parser.add_argument("--threads", type=int, default=4, help="requêtes de traduction simultanées par processus")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--max-chars", type=int, default=4500)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="latence du traducteur factice (s)")
+    parser.add_argument("--font", default="DejaVuSans.ttf")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.inputs, args.manifest)
+    if not paths:
+        parser.error("aucun PDF à traduire")
+    summary = run_batch(paths, args.output, args.source, args.target, args.workers, args.threads,
+                        args.backend, args.retries, args.max_chars, args.stub_latency, args.font)
+    with open(os.path.join(args.output, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import json
+import re
+
+from translation_cache import make_cache_key
+
+
+def build_batch_prompt(texts, target_langs, source_lang=None):
+    items = [{"id": i, "text": text} for i, text in enumerate(texts)]
+    origin = f"du {source_lang} " if source_lang else ""
+    example = {"translations": [{"id": 0, **{lang: "..." for lang in target_langs}}]}
+    return (
+        f"Traduis chaque texte {origin}vers les langues suivantes : {', '.join(target_langs)}.\n"
+        "Réponds uniquement avec un objet JSON valide, sans commentaire, au format :\n"
+        f"{json.dumps(example, ensure_ascii=False)}\n"
+        f"Textes :\n{json.dumps(items, ensure_ascii=False)}"
+    )
+
+
+def _extract_json(raw):
+    # Le modèle entoure parfois le JSON de ```json ... ``` ou de texte libre : on lit la
+    # valeur qui commence au premier « { » ou « [ », le texte qui suit est ignoré
+    raw = re.sub(r"```(?:json)?", "", raw or "")
+    starts = [start for start in (raw.find("{"), raw.find("[")) if start != -1]
+    for start in sorted(starts):
+        try:
+            return json.JSONDecoder().raw_decode(raw, start)[0]
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _batch_items(data, wanted):
+    if isinstance(data, dict) and "translations" in data:
+        data = data["translations"]
+    if isinstance(data, dict):
+        # Objet seul (un texte) : il porte un id ou directement les langues
+        if "id" in data or any(str(key).casefold() in wanted for key in data):
+            return [data]
+        # Variante {"0": {...}, "1": {...}}
+        return [dict(value, id=key) for key, value in data.items() if isinstance(value, dict)]
+    return data if isinstance(data, list) else []
+
+
+# Retourne {(indice du texte, langue): traduction} pour chaque élément lisible
+def parse_batch_response(raw, n_texts, target_langs):
+    wanted = {lang.casefold(): lang for lang in target_langs}
+    data = _batch_items(_extract_json(raw), wanted)
+    parsed = {}
+    for position, item in enumerate(data):
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("id", position))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= index < n_texts:
+            continue
+        for key, value in item.items():
+            lang = wanted.get(str(key).casefold())
+            if lang and isinstance(value, str) and value.strip():
+                parsed[(index, lang)] = value.strip()
+    return parsed
+
+
+# Traduit plusieurs textes vers plusieurs langues en une seule requête ; les éléments
+# absents ou illisibles de la réponse sont retraduits un par un via fallback
+def translate_batch(texts, target_langs, invoke, source_lang=None, fallback=None,
+                    cache=None, backend="groq", model=None):
+    results = [{} for _ in texts]
+    missing = []
+    for i, text in enumerate(texts):
+        for lang in target_langs:
+            cached = None
+            if cache is not None:
+                cached = cache.get(make_cache_key(backend, model, source_lang, lang, text))
+            if cached is not None:
+                results[i][lang] = cached
+            else:
+                missing.append((i, lang))
+
+    if missing:
+        texts_needed = sorted({i for i, _ in missing})
+        position = {i: n for n, i in enumerate(texts_needed)}
+        langs_needed = [lang for lang in target_langs if lang in {l for _, l in missing}]
+        parsed = {}
+        try:
+            raw = invoke(build_batch_prompt([texts[i] for i in texts_needed], langs_needed, source_lang))
+            parsed = parse_batch_response(raw, len(texts_needed), langs_needed)
+        except Exception:
+            if fallback is None:
+                raise
+
+        for i, lang in missing:
+            value = parsed.get((position[i], lang))
+            if value is None:
+                if fallback is None:
+                    continue
+                value = fallback(texts[i], lang, source_lang)
+            elif cache is not None:
+                cache.set(make_cache_key(backend, model, source_lang, lang, texts[i]), value)
+            results[i][lang] = value
+    return results
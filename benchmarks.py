@@ -0,0 +1,496 @@
+import argparse
+import base64
+import gc
+import glob
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from assets import flag, lottie
+from audio_cache import AudioSegmentCache, synthesize_incremental
+from groq_client import GroqGateway
+from image_preprocess import preprocess_image
+from local_captioning import peak_rss_mb, percentile
+from marian_translation import TranslationRouter
+from pdf_renderer import PDFRenderer
+from pipelines import Pipelines
+from resources import lazy_import
+from stub_backends import StubCaptioner, StubChatModel, StubTTSFactory, StubVisionClient, stub_translator_factory
+from tracing import Tracer, traced
+from translation_cache import TranslationCache
+from translation_memory import LeverageStats, TranslationMemory, translate_with_memory
+from tts_worker import TTSWorker
+
+
+# Banc d'essai hors ligne des pipelines de App.py (pipelines.Pipelines, celles que l'application
+# appelle), avec des moteurs factices à la place des services distants :
+#   python benchmarks.py --save benchmarks_baseline.json
+#   python benchmarks.py --compare benchmarks_baseline.json  (code 1 en cas de régression)
+#   python benchmarks.py --component translation_memory    (bancs d'essai par composant)
+
+WORDS = ("traduction automatique langue document page texte modèle phrase équipe audio "
+         "image service réseau données qualité rapide lecture synthèse voix résumé").split()
+
+
+def synthetic_text(words, seed=0):
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 18))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+# PDF de pages pages, paragraphs paragraphes par page, texte pseudo-aléatoire reproductible
+def synthetic_pdf(pages, paragraphs=6, words=60, seed=0):
+    fitz = lazy_import("fitz")
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        y = 50
+        for index in range(paragraphs):
+            text = synthetic_text(words, seed=seed * 100_003 + number * 101 + index)
+            rect = fitz.Rect(50, y, page.rect.width - 50, y + 110)
+            page.insert_textbox(rect, text, fontsize=10)
+            y += 115
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+# Image JPEG de size pixels de côté, motif propre à chaque graine (empreintes distinctes)
+def synthetic_image(size, seed=0):
+    Image = lazy_import("PIL.Image")
+    ImageDraw = lazy_import("PIL.ImageDraw")
+    rng = random.Random(seed)
+    image = Image.new("RGB", (size, size), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        x1, y1 = x0 + rng.randrange(size // 2 + 1), y0 + rng.randrange(size // 2 + 1)
+        draw.rectangle((x0, y0, x1, y1), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def measure(fn, inputs, units, repeat=3, setup=None):
+    # Échauffement, puis une mesure par entrée et par répétition ; pic mémoire Python
+    # (tracemalloc) relevé sur un passage séparé pour ne pas fausser les temps.
+    # setup (hors chronomètre) remet les caches à zéro avant chaque appel
+    setup = setup or (lambda: None)
+    setup()
+    fn(inputs[0])
+    latencies = []
+    elapsed = 0.0
+    for _ in range(repeat):
+        for item in inputs:
+            setup()
+            began = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - began)
+            elapsed += latencies[-1]
+    gc.collect()
+    setup()
+    tracemalloc.start()
+    fn(inputs[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "calls": len(latencies),
+        "units": units * repeat,
+        "throughput_per_s": round(units * repeat / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "peak_python_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+class Benchmarks:
+    def __init__(self, latency=0.005, repeat=3, quick=False, workers=4):
+        self.latency = latency
+        self.repeat = repeat
+        self.quick = quick
+        self.workers = workers
+
+    def sizes(self, full, quick):
+        return quick if self.quick else full
+
+    # Les pipelines de l'application, branchées sur les moteurs factices : passerelle sans
+    # limite de débit, caches en mémoire ou dans un dossier temporaire
+    def pipelines(self, directory):
+        os.environ.setdefault("PDF_AUDIO_WORKERS", str(self.workers))
+        os.environ.setdefault("PDF_TRANSLATION_WORKERS", str(self.workers))
+        os.environ.setdefault("PDF_TRANSLATION_RETRIES", "0")
+        tts = StubTTSFactory(latency=self.latency * 4)
+        return Pipelines(
+            llm=lambda model, chat=StubChatModel(latency=self.latency * 4): chat,
+            vision_client=lambda: StubVisionClient(latency=self.latency * 4),
+            gateway=lambda: GroqGateway(rpm=10**9, tpm=10**12, max_concurrency=64),
+            translator_factory=lambda: stub_translator_factory(self.latency, per_char=0.0),
+            tts_engine_factory=tts,
+            captioner=lambda: StubCaptioner(batch_latency=self.latency * 4, per_image=self.latency),
+            translation_cache=lambda: TranslationCache(path=None),
+            translation_memory=lambda: TranslationMemory(None),
+            audio_cache=lambda: AudioSegmentCache(os.path.join(directory, "audio"), max_bytes=50 * 1024 * 1024),
+            router=lambda: TranslationRouter(()),
+        )
+
+    def clear_translations(self):
+        self.app.translation_cache().clear()
+        self.app.translation_memory().clear()
+
+    # translate_text : cache, mémoire de traduction, passerelle Groq, modèle factice
+    def translate_text(self):
+        results = {}
+        for words in self.sizes((20, 200, 800), (20, 200)):
+            texts = [synthetic_text(words, seed=i) for i in range(20)]
+
+            def run(texts):
+                for text in texts:
+                    self.app.translate_text(text, "Anglais", "Français")
+            results[f"{words}_words"] = measure(run, [texts], units=len(texts), repeat=self.repeat,
+                                                setup=self.clear_translations)
+        return results
+
+    # translate_texts : une requête JSON pour plusieurs textes et langues
+    def translate_texts(self):
+        results = {}
+        for count in self.sizes((5, 20), (5,)):
+            texts = [synthetic_text(30, seed=i) for i in range(count)]
+            results[f"{count}_texts_x3_langs"] = measure(
+                lambda texts: self.app.translate_texts(texts, ["Anglais", "Espagnol", "Allemand"], "Français"),
+                [texts], units=count * 3, repeat=self.repeat, setup=self.clear_translations,
+            )
+        return results
+
+    # translate_pdf_document : extraction, découpage, traduction en flux
+    def translate_pdf(self):
+        results = {}
+        for pages in self.sizes((5, 50, 200), (5, 50)):
+            pdf = synthetic_pdf(pages)
+            results[f"{pages}_pages"] = measure(
+                lambda pdf: self.app.translate_pdf_document(pdf, "Français", "Anglais"),
+                [pdf], units=pages, repeat=self.repeat, setup=self.clear_translations,
+            )
+        return results
+
+    # Bloc d'export PDF : rendu FPDF du texte traduit
+    def pdf_export(self):
+        results = {}
+        renderer = self.app.pdf_renderer()
+        for paragraphs in self.sizes((60, 600, 3000), (60, 600)):
+            text = "\n".join(synthetic_text(60, seed=i) for i in range(paragraphs))
+            results[f"{paragraphs}_paragraphs"] = measure(renderer.render, [text], units=paragraphs,
+                                                          repeat=self.repeat)
+        return results
+
+    # generate_captions : préparation, empreinte, cache, modèle de vision (factice) via la passerelle
+    def generate_caption(self):
+        results = {}
+        cache = self.app.caption_cache("groq")
+        for size in self.sizes((256, 1024, 3000), (256, 1024)):
+            images = [synthetic_image(size, seed=i) for i in range(8)]
+            # Cache vidé avant chaque appel : chemin complet (défaut de cache)
+            results[f"{size}px"] = measure(lambda data: self.app.generate_captions([data], "groq"),
+                                           images, units=len(images), repeat=self.repeat, setup=cache.clear)
+        return results
+
+    # generate_audio : synthèse phrase par phrase sur le thread TTS, cache audio vidé
+    def generate_audio(self):
+        results = {}
+        cache = self.app.audio_cache()
+        for words in self.sizes((20, 200, 1000), (20, 200)):
+            text = synthetic_text(words)
+            results[f"{words}_words"] = measure(lambda text: self.app.generate_audio(text, "Français"),
+                                                [text], units=1, repeat=self.repeat, setup=cache.clear)
+        return results
+
+    # read_pdf_to_audio : segments synthétisés en parallèle dans un pool de processus
+    def read_pdf_to_audio(self):
+        results = {}
+        for pages in self.sizes((5, 30), (5,)):
+            pdf = synthetic_pdf(pages)
+            results[f"{pages}_pages"] = measure(lambda pdf: self.app.pdf_audio_job(lambda *a, **k: None, pdf),
+                                                [pdf], units=pages, repeat=self.repeat)
+        return results
+
+    PIPELINES = ("translate_text", "translate_texts", "translate_pdf", "pdf_export",
+                 "generate_caption", "generate_audio", "read_pdf_to_audio")
+
+    def run(self, only=None):
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "stub_latency_s": self.latency,
+                "repeat": self.repeat,
+                "quick": self.quick,
+            },
+            "pipelines": {},
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            self.app = self.pipelines(directory)
+            try:
+                for name in self.PIPELINES:
+                    if only and name not in only:
+                        continue
+                    print(f"▶ {name}", file=sys.stderr)
+                    report["pipelines"][name] = getattr(self, name)()
+            finally:
+                self.app.close()
+        report["environment"]["peak_rss_mb"] = peak_rss_mb()
+        return report
+
+
+# --- Bancs d'essai par composant : python benchmarks.py --component NOM ---
+
+# Fichiers statiques : analyse à chaque rerun contre cache par processus, poids des drapeaux
+def bench_assets(quick=False):
+    started = time.perf_counter()
+    for _ in range(10):
+        with open("animation.json", "r", encoding="utf-8") as f:
+            json.load(f)
+    parse_ms = (time.perf_counter() - started) * 100
+    lottie("animation.json")
+    started = time.perf_counter()
+    for _ in range(10):
+        lottie("animation.json")
+    print(f"animation.json : {parse_ms:.2f} ms par rerun avant, {(time.perf_counter() - started) * 100:.4f} ms après")
+    for width in (50, 75):
+        before = after = 0
+        for path in sorted(glob.glob("*.jpg")):
+            before += os.path.getsize(path)
+            after += len(flag(path, width))
+        print(f"drapeaux à {width} px : {before} -> {after} octets")
+
+
+# Préparation des images (drapeaux fournis) : octets envoyés et temps de préparation
+def bench_image_preprocess(quick=False, max_edge=512):
+    total_raw = total_sent = 0
+    for path in sorted(glob.glob("*.jpg")):
+        with open(path, "rb") as f:
+            raw = f.read()
+        start = time.perf_counter()
+        data, mime = preprocess_image(raw, max_edge=max_edge)
+        elapsed = (time.perf_counter() - start) * 1000
+        raw_b64 = len(base64.b64encode(raw))
+        sent_b64 = len(base64.b64encode(data))
+        total_raw += raw_b64
+        total_sent += sent_b64
+        print(f"{path:10s} {raw_b64:>9d} -> {sent_b64:>9d} octets base64 ({mime}, {elapsed:.1f} ms)")
+    if total_raw:
+        print(f"Total : {total_raw} -> {total_sent} octets ({100 * total_sent / total_raw:.0f} %)")
+
+
+# Rendu PDF : ancienne méthode (police rechargée, multi_cell ligne à ligne) contre PDFRenderer
+def bench_pdf_renderer(quick=False):
+    FPDF = lazy_import("fpdf").FPDF
+    line = "La traduction automatique réduit les barrières linguistiques entre les équipes. " * 2
+    lines_per_page = 25
+
+    def render_naive(text):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
+        pdf.set_font('DejaVu', '', 12)
+        for text_line in text.split('\n'):
+            pdf.multi_cell(0, 10, text_line)
+        return pdf.output(dest='S').encode('latin1')
+
+    started = time.perf_counter()
+    renderer = PDFRenderer()
+    print(f"chargement de la police : {(time.perf_counter() - started) * 1000:.0f} ms")
+    for pages in ((10, 100) if quick else (10, 100, 1000)):
+        text = "\n".join([line] * (pages * lines_per_page // 2))
+        started = time.perf_counter()
+        new_size = len(renderer.render(text))
+        new_time = time.perf_counter() - started
+        started = time.perf_counter()
+        old_size = len(render_naive(text))
+        old_time = time.perf_counter() - started
+        print(f"{pages:>5} pages : avant {old_time:7.2f} s ({old_size} o), après {new_time:7.2f} s ({new_size} o)")
+
+
+# Surcoût de @traced par appel : sans tracing, échantillonnage à 0, 1 % et 100 %
+def bench_tracing(quick=False):
+    calls = 20_000 if quick else 200_000
+
+    def work(text, lang="fr"):
+        return text
+
+    class NullExporter:
+        def export(self, span):
+            pass
+
+    variants = {
+        "appel nu": work,
+        "non configuré": traced("Bench", tracer=Tracer())(work),
+        "taux 0": traced("Bench", tracer=Tracer(NullExporter(), default_rate=0.0))(work),
+        "taux 0.01": traced("Bench", tracer=Tracer(NullExporter(), default_rate=0.01))(work),
+        "taux 1": traced("Bench", tracer=Tracer(NullExporter(), default_rate=1.0))(work),
+    }
+    baseline = None
+    for label, fn in variants.items():
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn("bonjour", lang="en")
+        per_call = (time.perf_counter() - started) / calls * 1e9
+        baseline = baseline or per_call
+        print(f"{label:>14} : {per_call:8.0f} ns/appel (+{per_call - baseline:.0f} ns)")
+
+
+# Mémoire de traduction : temps de recherche (exacte, proche, absente) et reprise sur
+# une révision de document
+def bench_translation_memory(quick=False):
+    count = 10_000 if quick else 100_000
+    rng = random.Random(0)
+    # 20 000 pseudo-mots : des phrases aussi variées qu'un vrai corpus
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyzéè") for _ in range(rng.randint(2, 10)))
+             for _ in range(20_000)]
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 16))).capitalize() + f" {rng.randrange(10**6)}."
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = TranslationMemory(os.path.join(directory, "tm.sqlite3"))
+        started = time.perf_counter()
+        sources = [sentence() for _ in range(count)]
+        for start in range(0, count, 10_000):
+            memory.add_many("fr", "en", [(s, f"EN {s}") for s in sources[start:start + 10_000]])
+        print(f"{count} segments indexés en {time.perf_counter() - started:.1f} s")
+
+        probes = {
+            "exacte": sources[:1000],
+            "proche": [s.replace(s.split()[2], "avenant", 1) for s in sources[:1000]],
+            "absente": [sentence() for _ in range(1000)],
+        }
+        for label, texts in probes.items():
+            found = 0
+            started = time.perf_counter()
+            for text in texts:
+                found += memory.lookup("fr", "en", text) is not None
+            per_lookup = (time.perf_counter() - started) / len(texts) * 1000
+            print(f"recherche {label:>8} : {per_lookup:.3f} ms, {found}/{len(texts)} trouvées")
+
+        calls = []
+        document = "\n".join(" ".join(sources[i:i + 4]) for i in range(0, 400, 4))
+        revision = document.replace(sources[10], sources[10].replace(" ", "  revu ", 1))
+
+        def translate(text):
+            calls.append(text)
+            return "\n".join(f"EN {line}" for line in text.split("\n"))
+        leverage = LeverageStats()
+        translate_with_memory(revision, "fr", "en", translate, memory, leverage=leverage)
+        print(f"révision de 400 phrases : {len(calls)} appel(s), {leverage.as_dict()}")
+
+
+# Synthèse incrémentale : régénération complète contre régénération après la modification
+# d'une phrase (moteur factice, latence par caractère)
+def bench_audio_cache(quick=False):
+    rng = random.Random(0)
+    words = "voix lecture phrase texte audio synthèse document page rapide langue".split()
+    sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize() + "."
+                 for _ in range(60)]
+    text = " ".join(sentences)
+    edited = text.replace(sentences[30], sentences[30].replace(" ", " nouvelle ", 1))
+
+    worker = TTSWorker(engine_factory=StubTTSFactory(latency=0.01, per_char=0.0005))
+    voice = worker.voice_id("Français")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AudioSegmentCache(directory, max_bytes=50 * 1024 * 1024)
+        started = time.perf_counter()
+        worker.synthesize(text, "Français")
+        print(f"texte entier (avant) : {(time.perf_counter() - started) * 1000:.0f} ms")
+        for label, version in (("premier passage", text), ("une phrase modifiée", edited), ("inchangé", edited)):
+            started = time.perf_counter()
+            synthesize_incremental(version, "Français", worker.submit, cache, voice=voice)
+            print(f"{label} : {(time.perf_counter() - started) * 1000:.1f} ms")
+        small = AudioSegmentCache(os.path.join(directory, "petit"), max_bytes=1024 * 1024)
+        synthesize_incremental(text, "Français", worker.submit, small, voice=voice)
+        print(f"cache borné à 1 Mo : {small.report()}")
+    worker.close()
+
+
+COMPONENTS = {
+    "assets": bench_assets,
+    "image_preprocess": bench_image_preprocess,
+    "pdf_renderer": bench_pdf_renderer,
+    "tracing": bench_tracing,
+    "translation_memory": bench_translation_memory,
+    "audio_cache": bench_audio_cache,
+}
+
+
+# Régression : p50 plus lent ou débit plus faible que la référence au-delà de la tolérance
+def compare(report, baseline, tolerance=0.2):
+    regressions = []
+    for pipeline, cases in report["pipelines"].items():
+        for case, result in cases.items():
+            reference = baseline.get("pipelines", {}).get(pipeline, {}).get(case)
+            if reference is None:
+                continue
+            if result["p50_ms"] > reference["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{pipeline}/{case} : p50 {reference['p50_ms']} -> {result['p50_ms']} ms")
+            if result["throughput_per_s"] < reference["throughput_per_s"] * (1 - tolerance):
+                regressions.append(f"{pipeline}/{case} : débit {reference['throughput_per_s']} -> "
+                                   f"{result['throughput_per_s']} /s")
+    return regressions
+
+
+def print_table(report):
+    print(f"{'pipeline/cas':<36}{'débit/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'pic Mo':>9}")
+    for pipeline, cases in report["pipelines"].items():
+        for case, result in cases.items():
+            print(f"{pipeline + '/' + case:<36}{result['throughput_per_s']:>10}{result['p50_ms']:>10}"
+                  f"{result['p95_ms']:>10}{result['peak_python_mb']:>9}")
+    print(f"RSS max du processus : {report['environment']['peak_rss_mb']} Mo")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne des pipelines LanguePro AI")
+    parser.add_argument("--only", nargs="*", choices=Benchmarks.PIPELINES, help="pipelines à mesurer")
+    parser.add_argument("--component", nargs="*", choices=sorted(COMPONENTS),
+                        help="bancs d'essai par composant (au lieu des pipelines)")
+    parser.add_argument("--latency", type=float, default=0.005, help="latence des moteurs factices (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--quick", action="store_true", help="tailles réduites")
+    parser.add_argument("--save", help="écrit le rapport JSON (référence)")
+    parser.add_argument("--compare", help="compare à une référence JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if args.component is not None:
+        for name in args.component or sorted(COMPONENTS):
+            print(f"▶ {name}")
+            COMPONENTS[name](quick=args.quick)
+        return 0
+
+    report = Benchmarks(args.latency, args.repeat, args.quick, args.workers).run(args.only)
+    print_table(report)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
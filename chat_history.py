@@ -0,0 +1,78 @@
+from collections import deque
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from groq_client import estimate_tokens
+
+
+class ContextWindowManager:
+    # Garde le message système et les derniers tours ; au-delà du budget, les tours
+    # les plus anciens sont résumés dans un résumé glissant
+    def __init__(self, max_prompt_tokens=6000, keep_recent=6, summarizer=None,
+                 count_tokens=estimate_tokens, message_overhead=4, max_summary_tokens=600,
+                 metrics_window=100):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.message_overhead = message_overhead
+        self.max_summary_tokens = max_summary_tokens
+        self.summary = ""
+        self.folded = 0  # nombre de messages d'historique déjà résumés
+        self.metrics = deque(maxlen=metrics_window)
+
+    # Contenu plus un surcoût fixe par message pour les balises de rôle
+    def _message_tokens(self, message):
+        return self.count_tokens(message.content) + self.message_overhead
+
+    def _prompt_tokens(self, messages):
+        return sum(self._message_tokens(m) for m in messages)
+
+    def _summary_message(self):
+        return SystemMessage(content=f"Résumé de la conversation précédente : {self.summary}")
+
+    def _fold(self, messages):
+        if self.summarizer is not None:
+            self.summary = self.summarizer(self.summary, messages)
+        # Le résumé lui-même reste borné
+        max_chars = self.max_summary_tokens * 4
+        if len(self.summary) > max_chars:
+            self.summary = self.summary[-max_chars:]
+        self.folded += len(messages)
+
+    def build_prompt(self, messages):
+        system, history = messages[0], messages[1:]
+        recent = history[self.folded:]
+
+        def assemble(recent_messages):
+            prompt = [system]
+            if self.summary:
+                prompt.append(self._summary_message())
+            return prompt + list(recent_messages)
+
+        prompt = assemble(recent)
+        if self._prompt_tokens(prompt) > self.max_prompt_tokens and len(recent) > self.keep_recent:
+            self._fold(recent[:len(recent) - self.keep_recent])
+            recent = history[self.folded:]
+            prompt = assemble(recent)
+
+        # Derniers recours : des tours récents trop longs sont retirés du plus ancien au plus récent
+        dropped = 0
+        while self._prompt_tokens(prompt) > self.max_prompt_tokens and len(recent) > 1:
+            recent = recent[1:]
+            dropped += 1
+            prompt = assemble(recent)
+
+        self.metrics.append({
+            "turn": sum(1 for m in history if isinstance(m, HumanMessage)),
+            "history_messages": len(history),
+            "sent_messages": len(prompt),
+            "summarized_messages": self.folded,
+            "dropped_messages": dropped,
+            "prompt_tokens": self._prompt_tokens(prompt),
+            "summary_tokens": self.count_tokens(self.summary),
+        })
+        return prompt
+
+    def last_metrics(self):
+        return self.metrics[-1] if self.metrics else None
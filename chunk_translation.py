@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import byte_size, inc, stage
+from translation_memory import translate_with_memory
+
+
+class ChunkTranslationEngine:
+    # Traduit les morceaux en parallèle (pool borné) et les restitue dans l'ordre d'origine
+    def __init__(self, translator_factory, max_workers=4, max_retries=3,
+                 backoff=0.5, max_backoff=8.0, cache=None, memory=None, reuse_threshold=1.0,
+                 sleep=time.sleep):
+        self.translator_factory = translator_factory
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache = cache
+        # Mémoire de traduction : les phrases déjà traduites (révisions d'un même document)
+        # sont reprises, seules les autres partent au traducteur
+        self.memory = memory
+        self.reuse_threshold = reuse_threshold
+        self._sleep = sleep
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chunk-translate")
+
+    # Un traducteur par thread et par paire de langues, réutilisé d'un morceau à l'autre
+    def _translator(self, source_lang, target_lang):
+        translators = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        key = (source_lang, target_lang)
+        if key not in translators:
+            translators[key] = self.translator_factory(source_lang, target_lang)
+        return translators[key]
+
+    def _translate_with_retry(self, chunk, source_lang, target_lang, backend="google"):
+        attempt = 0
+        while True:
+            try:
+                with stage("translation", backend=backend):
+                    result = self._translator(source_lang, target_lang).translate(chunk)
+                result = result if result is not None else ""
+                inc("bytes_total", byte_size(chunk), stage="translation", direction="in")
+                inc("bytes_total", byte_size(result), stage="translation", direction="out")
+                return result
+            except Exception:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                inc("retries_total", component="chunk_translation", backend=backend)
+                delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+                self._sleep(delay * random.uniform(0.5, 1.0))
+
+    def _compute(self, chunk, source_lang, target_lang, backend, model, leverage):
+        if self.memory is None:
+            return self._translate_with_retry(chunk, source_lang, target_lang, backend)
+        return translate_with_memory(
+            chunk, source_lang, target_lang,
+            lambda text: self._translate_with_retry(text, source_lang, target_lang, backend),
+            self.memory, self.reuse_threshold, leverage, backend, model,
+        )
+
+    def _translate_chunk(self, chunk, source_lang, target_lang, backend, model, leverage=None):
+        if not chunk.strip():
+            return chunk
+        if self.cache is None:
+            return self._compute(chunk, source_lang, target_lang, backend, model, leverage)
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return self._compute(chunk, source_lang, target_lang, backend, model, leverage)
+        result = self.cache.get_or_compute(backend, model, source_lang, target_lang, chunk, compute)
+        if leverage is not None and not computed:
+            leverage.record_cached(chunk)
+        return result
+
+    def translate_chunks(self, chunks, source_lang, target_lang,
+                         backend="google", model="deep_translator", leverage=None):
+        futures = [
+            self._executor.submit(self._translate_chunk, chunk, source_lang, target_lang, backend, model, leverage)
+            for chunk in chunks
+        ]
+        # L'ordre des futures est celui des morceaux : le résultat est donc réordonné
+        return [future.result() for future in futures]
+
+    # Variante en flux : consomme un itérateur de morceaux avec une fenêtre bornée de
+    # requêtes en vol et rend les traductions dans l'ordre dès qu'elles sont prêtes
+    def translate_stream(self, chunks, source_lang, target_lang, max_in_flight=None,
+                         backend="google", model="deep_translator", leverage=None):
+        window = max_in_flight or self.max_workers * 2
+        pending = deque()
+        for chunk in chunks:
+            pending.append(self._executor.submit(
+                self._translate_chunk, chunk, source_lang, target_lang, backend, model, leverage
+            ))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,230 @@
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+
+from metrics import inc, stage
+
+
+# Erreurs définitives (réponse 5xx : adresse refusée, message rejeté) : inutile de réessayer ;
+# un échec d'authentification est réessayé, le mot de passe peut être corrigé entre-temps
+def is_permanent(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def smtp_connector(host="smtp.gmail.com", port=465, user=None, password=None, use_ssl=True, timeout=30):
+    # Fabrique de connexions authentifiées, appelée par le worker quand il n'en a pas
+    def connect():
+        if use_ssl:
+            smtp = smtplib.SMTP_SSL(host, port, timeout=timeout)
+        else:
+            smtp = smtplib.SMTP(host, port, timeout=timeout)
+        if user and password:
+            smtp.login(user, password)
+        return smtp
+    return connect
+
+
+class EmailOutbox:
+    # File d'envoi durable (SQLite) vidée par un thread de fond : enqueue() rend la main
+    # immédiatement ; le worker garde une connexion SMTP ouverte entre les messages,
+    # envoie par lots et réessaie avec un backoff exponentiel
+    def __init__(self, path="email_outbox.sqlite3", connect=None, batch_size=20, max_attempts=5,
+                 base_delay=5.0, max_delay=600.0, idle_timeout=60.0, poll_interval=30.0):
+        self.path = path
+        self.connect = connect or smtp_connector()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._smtp = None
+        self._last_used = 0.0
+        self.stats = {"connections": 0, "sent": 0, "retries": 0, "failed": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id TEXT PRIMARY KEY, sender TEXT, recipient TEXT NOT NULL, subject TEXT, body TEXT, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+            "last_error TEXT, created_at REAL NOT NULL, sent_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+        # Messages interrompus en cours d'envoi (arrêt du processus) : remis en file
+        self._conn.execute("UPDATE outbox SET status = 'queued' WHERE status = 'sending'")
+        self._conn.commit()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, sender, recipient, subject, body):
+        if not recipient:
+            raise ValueError("destinataire manquant (EMAIL_USER non configuré ?)")
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (id, sender, recipient, subject, body, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (message_id, sender, recipient, subject, body, now, now),
+            )
+            self._conn.commit()
+        inc("emails_total", result="queued")
+        self._wakeup.set()
+        return message_id
+
+    def status(self, message_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error, created_at, sent_at, next_attempt_at "
+                "FROM outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, attempts, last_error, created_at, sent_at, next_attempt_at = row
+        return {"id": message_id, "status": status, "attempts": attempts, "last_error": last_error,
+                "created_at": created_at, "sent_at": sent_at,
+                "next_attempt_at": next_attempt_at if status == "queued" else None}
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _due(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, sender, recipient, subject, body, attempts FROM outbox "
+                "WHERE status = 'queued' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), self.batch_size),
+            ).fetchall()
+            if rows:
+                self._conn.executemany("UPDATE outbox SET status = 'sending' WHERE id = ?",
+                                       [(row[0],) for row in rows])
+                self._conn.commit()
+        return rows
+
+    def _next_wait(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'queued'"
+            ).fetchone()
+        if row[0] is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, row[0] - time.time()))
+
+    def _mark(self, message_id, status, attempts, error=None, next_attempt_at=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), sent_at = ? WHERE id = ?",
+                (status, attempts, error, next_attempt_at, time.time() if status == "sent" else None, message_id),
+            )
+            self._conn.commit()
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                # Connexion restée inactive : on vérifie qu'elle répond encore
+                if time.monotonic() - self._last_used > 5 and self._smtp.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("connexion inutilisable")
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                self._close()
+        with stage("smtp_connect"):
+            self._smtp = self.connect()
+        self.stats["connections"] += 1
+        return self._smtp
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _send(self, sender, recipient, subject, body):
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = sender
+        msg["To"] = recipient
+        msg.set_content(body)
+        try:
+            self._connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Le serveur a fermé la connexion gardée ouverte : une seule reconnexion
+            self._smtp = None
+            self._connection().send_message(msg)
+        self._last_used = time.monotonic()
+
+    def _deliver(self, row):
+        message_id, sender, recipient, subject, body, attempts = row
+        attempts += 1
+        try:
+            with stage("email_send"):
+                self._send(sender, recipient, subject, body)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if not isinstance(e, smtplib.SMTPResponseException):
+                # Erreur réseau : connexion dans un état inconnu, la suivante sera neuve
+                self._close()
+            if is_permanent(e) or attempts >= self.max_attempts:
+                self._mark(message_id, "failed", attempts, error)
+                self.stats["failed"] += 1
+                inc("emails_total", result="failed")
+                return
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            self._mark(message_id, "queued", attempts, error, time.time() + delay * random.uniform(0.5, 1.0))
+            self.stats["retries"] += 1
+            inc("retries_total", component="email")
+            return
+        self._mark(message_id, "sent", attempts)
+        self.stats["sent"] += 1
+        inc("emails_total", result="sent")
+
+    def _run(self):
+        while not self._stopped:
+            rows = self._due()
+            for row in rows:
+                self._deliver(row)
+            if rows:
+                continue
+            if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                self._close()
+            wait = self._next_wait()
+            if self._smtp is not None:
+                wait = min(wait, self.idle_timeout)
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+        self._close()
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+
+
+def outbox_from_env():
+    return EmailOutbox(
+        path=os.getenv("EMAIL_OUTBOX_PATH", "email_outbox.sqlite3"),
+        connect=smtp_connector(
+            host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", "465")),
+            user=os.getenv("EMAIL_USER"),
+            password=os.getenv("EMAIL_PASS"),
+            use_ssl=os.getenv("SMTP_SSL", "1") == "1",
+        ),
+        max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "5")),
+    )
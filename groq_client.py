@@ -0,0 +1,229 @@
+import math
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+from metrics import inc, stage
+from resources import lazy_import
+
+
+class RateLimitedError(Exception):
+    # Levée quand Groq reste saturé après toutes les tentatives
+    def __init__(self, model, retry_after=None):
+        self.model = model
+        self.retry_after = retry_after
+        wait = f" Réessayez dans {math.ceil(retry_after)} s." if retry_after else ""
+        super().__init__(f"Le service Groq ({model}) est momentanément saturé.{wait}")
+
+
+class TokenBucket:
+    # capacity unités, rechargées à rate unités par seconde ; acquire() attend si besoin
+    def __init__(self, capacity, rate, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1, sleep=time.sleep):
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            sleep(wait)
+
+    # Après un 429 : le bucket est vidé pour que les autres threads ralentissent aussi
+    def drain(self):
+        with self._lock:
+            self._refill()
+            self._tokens = 0
+
+
+class AdaptiveConcurrency:
+    # Limite de requêtes simultanées en AIMD : +1 par fenêtre réussie, divisée par deux sur 429
+    def __init__(self, initial=4, minimum=1, maximum=16):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+# Code HTTP et en-tête retry-after, quel que soit le client (SDK groq/httpx, urllib)
+def error_status(exc):
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+    retry_after = None
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value is not None:
+        try:
+            retry_after = float(value)
+        except ValueError:
+            retry_after = None
+    return (status if isinstance(status, int) else None), retry_after
+
+
+# Estimation rapide du nombre de tokens (~4 caractères par token pour llama3) ;
+# completion_tokens : réponse attendue, réservée dans le budget tokens/minute
+def estimate_tokens(text, completion_tokens=0):
+    return math.ceil(len(text) / 4) + completion_tokens
+
+
+class GroqGateway:
+    # Point de passage commun à ChatGroq et au client Groq : limites par modèle en
+    # requêtes/minute et tokens/minute, concurrence adaptative et reprise sur 429/5xx
+    def __init__(self, rpm=30, tpm=30_000, model_limits=None, max_retries=4, base_delay=0.5,
+                 max_delay=30.0, max_concurrency=8, sleep=time.sleep):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._models = {}
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0}
+
+    def _model(self, model):
+        with self._lock:
+            if model not in self._models:
+                rpm, tpm = self.model_limits.get(model, (self.rpm, self.tpm))
+                self._models[model] = (
+                    TokenBucket(rpm, rpm / 60.0),
+                    TokenBucket(tpm, tpm / 60.0),
+                    AdaptiveConcurrency(initial=min(4, self.max_concurrency), maximum=self.max_concurrency),
+                )
+            return self._models[model]
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _backoff(self, attempt, retry_after):
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        # Backoff exponentiel avec « full jitter »
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _attempts(self, model, tokens):
+        requests, token_bucket, concurrency = self._model(model)
+        attempt = 0
+        while True:
+            requests.acquire(1, self._sleep)
+            token_bucket.acquire(tokens, self._sleep)
+            concurrency.acquire()
+            yield attempt, requests, concurrency
+            attempt += 1
+
+    def _handle_error(self, exc, model, attempt, requests, concurrency):
+        status, retry_after = error_status(exc)
+        throttled = status == 429
+        concurrency.release(throttled=throttled)
+        retryable = throttled or (status is not None and status >= 500)
+        inc("llm_errors_total", model=model, status=status or "error")
+        if throttled:
+            self._count("throttled")
+            requests.drain()
+        if not retryable or attempt >= self.max_retries:
+            self._count("failures")
+            if throttled:
+                raise RateLimitedError(model, retry_after) from exc
+            raise exc
+        self._count("retries")
+        inc("retries_total", component="groq", model=model)
+        self._sleep(self._backoff(attempt, retry_after))
+
+    def call(self, model, fn, tokens=0):
+        self._count("calls")
+        inc("tokens_total", tokens, model=model)
+        for attempt, requests, concurrency in self._attempts(model, tokens):
+            try:
+                with stage("llm", model=model):
+                    result = fn()
+            except Exception as exc:
+                self._handle_error(exc, model, attempt, requests, concurrency)
+                continue
+            concurrency.release()
+            return result
+
+    # Flux : reprise possible tant qu'aucun token n'a été rendu
+    def stream(self, model, fn, tokens=0):
+        self._count("calls")
+        inc("tokens_total", tokens, model=model)
+        for attempt, requests, concurrency in self._attempts(model, tokens):
+            started = False
+            try:
+                for chunk in fn():
+                    started = True
+                    yield chunk
+            except Exception as exc:
+                if started:
+                    concurrency.release()
+                    raise
+                self._handle_error(exc, model, attempt, requests, concurrency)
+                continue
+            except BaseException:
+                # Flux abandonné par le consommateur (GeneratorExit)
+                concurrency.release()
+                raise
+            concurrency.release()
+            return
+
+    def report(self):
+        with self._lock:
+            report = dict(self.stats)
+            report["concurrency"] = {model: round(c.limit, 2) for model, (_, _, c) in self._models.items()}
+        return report
+
+
+# Pool de connexions HTTP partagé par ChatGroq et Groq() (keep-alive, HTTP/1.1)
+@lru_cache(maxsize=None)
+def get_http_client():
+    httpx = lazy_import("httpx")
+    connections = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    return GroqGateway(
+        rpm=int(os.getenv("GROQ_RPM", "30")),
+        tpm=int(os.getenv("GROQ_TPM", "30000")),
+        max_retries=int(os.getenv("GROQ_MAX_RETRIES", "4")),
+        max_concurrency=int(os.getenv("GROQ_MAX_CONCURRENCY", "8")),
+    )
@@ -0,0 +1,115 @@
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def load_image(data):
+    image = Image.open(io.BytesIO(data))
+    # Les photos de téléphone portent leur orientation dans l'EXIF
+    return ImageOps.exif_transpose(image)
+
+
+# Fichier d'origine envoyable tel quel : format accepté et sans rotation EXIF à appliquer
+def _original_format(data):
+    with Image.open(io.BytesIO(data)) as original:
+        if original.format not in MIME_TYPES or original.getexif().get(0x0112, 1) != 1:
+            return None
+        return original.format
+
+
+# Réduit l'image à max_edge pixels sur son plus grand côté et la ré-encode de façon compacte ;
+# une image déjà à la bonne taille est envoyée telle quelle si elle est déjà compacte (JPEG,
+# WebP) ou si le ré-encodage ne la rendrait pas plus petite
+def preprocess_image(image, max_edge=1024, fmt="JPEG", quality=85, original=None):
+    if isinstance(image, (bytes, bytearray)):
+        original = bytes(image)
+        image = load_image(image)
+    fmt = fmt.upper()
+    original_format = None
+    if max(image.size) > max_edge:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    elif original is not None:
+        original_format = _original_format(original)
+        if original_format in ("JPEG", "WEBP"):
+            return original, MIME_TYPES[original_format]
+
+    if fmt == "JPEG" and image.mode != "RGB":
+        # Le JPEG n'a pas de transparence : on aplatit sur fond blanc
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[3])
+        image = background
+    elif fmt == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    buffered = io.BytesIO()
+    options = {"optimize": True} if fmt == "PNG" else {"quality": quality}
+    image.save(buffered, format=fmt, **options)
+    if original_format is not None and len(original) <= buffered.tell():
+        return original, MIME_TYPES[original_format]
+    return buffered.getvalue(), MIME_TYPES[fmt]
+
+
+# Empreinte perceptuelle (dHash) : deux images quasi identiques ont des empreintes proches
+def dhash(image, hash_size=8):
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class CaptionCache:
+    # Légendes indexées par empreinte perceptuelle, avec éviction LRU
+    def __init__(self, max_items=1024, max_distance=4):
+        self.max_items = max_items
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_hash):
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for known_hash in self._entries:
+                distance = hamming_distance(known_hash, image_hash)
+                if distance < best_distance:
+                    best, best_distance = known_hash, distance
+                    if distance == 0:
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best]
+
+    def set(self, image_hash, caption):
+        with self._lock:
+            self._entries[image_hash] = caption
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "items": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,143 @@
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class Job:
+    def __init__(self, job_id, session_id, kind, fn, args, kwargs):
+        self.id = job_id
+        self.session_id = session_id
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"  # queued, running, done, failed, cancelled
+        self.done = 0
+        self.total = None
+        self.unit = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def report(self, done, total=None, unit=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if unit is not None:
+            self.unit = unit
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "unit": self.unit,
+            "error": self.error,
+            "created_at": self.created_at,
+            "elapsed_s": round((self.finished_at or time.time()) - (self.started_at or self.created_at), 2),
+        }
+
+
+class JobManager:
+    # Tâches longues exécutées hors du thread du script Streamlit : elles survivent aux
+    # reruns, rendent compte de leur avancement et gardent leur résultat jusqu'à lecture.
+    # Limites : max_workers tâches en même temps au total, per_session par session.
+    def __init__(self, max_workers=4, per_session=2, result_ttl=3600):
+        self.per_session = per_session
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = defaultdict(int)
+        self._waiting = defaultdict(deque)
+
+    # fn reçoit en premier argument la fonction d'avancement progress(done, total=None, unit=None)
+    def submit(self, session_id, kind, fn, *args, **kwargs):
+        job = Job(uuid.uuid4().hex[:12], session_id, kind, fn, args, kwargs)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+            if self._active[session_id] < self.per_session:
+                self._dispatch(job)
+            else:
+                self._waiting[session_id].append(job)
+        return job.id
+
+    def _dispatch(self, job):
+        self._active[job.session_id] += 1
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            if job.status == "cancelled":
+                return
+            job.status = "running"
+            job.started_at = time.time()
+            job.result = job.fn(job.report, *job.args, **job.kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            job.fn = job.args = job.kwargs = None
+            with self._lock:
+                self._active[job.session_id] -= 1
+                waiting = self._waiting[job.session_id]
+                while waiting and self._active[job.session_id] < self.per_session:
+                    self._dispatch(waiting.popleft())
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job is not None else None
+
+    def list(self, session_id):
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.session_id == session_id]
+        return [job.snapshot() for job in sorted(jobs, key=lambda j: j.created_at)]
+
+    # Tâche terminée (réussie, échouée ou annulée) rendue une seule fois puis libérée :
+    # état, erreur éventuelle et résultat
+    def fetch(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in FINISHED:
+                return None
+            del self._jobs[job_id]
+        return {**job.snapshot(), "result": job.result}
+
+    # Retire une tâche terminée sans lire son résultat (tâche annulée, échec déjà lu)
+    def dismiss(self, job_id):
+        return self.fetch(job_id) is not None
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return False
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            waiting = self._waiting[job.session_id]
+            if job in waiting:
+                waiting.remove(job)
+            return True
+
+    # Seules les tâches annulées expirent : un résultat (ou une erreur) reste disponible
+    # jusqu'à sa lecture par fetch, qui le retire aussitôt
+    def _purge_expired(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status == "cancelled" and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
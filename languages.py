@@ -0,0 +1,18 @@
+# Noms affichés dans l'interface -> codes de langue
+LANGUAGE_CODES = {
+    "Français": "fr",
+    "Anglais": "en",
+    "Espagnol": "es",
+    "Allemand": "de",
+    "Arabe": "ar",
+    "Chinois": "zh",
+    "Portugais": "pt",
+    "Italien": "it",
+}
+
+
+# "Français" -> "fr", "zh-CN" -> "zh"
+def language_code(lang):
+    if not lang:
+        return None
+    return LANGUAGE_CODES.get(lang, lang).split("-")[0].lower()
@@ -0,0 +1,49 @@
+import time
+
+from metrics import inc, observe
+
+
+class TokenStream:
+    # Enveloppe un flux de morceaux (llm.stream) : rend le texte au fil de l'eau,
+    # assemble la réponse complète et mesure le délai du premier token
+    def __init__(self, chunks, on_complete=None, clock=time.perf_counter):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self._clock = clock
+        self._parts = []
+        self.started_at = clock()
+        self.first_token_at = None
+        self.finished_at = None
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            token = getattr(chunk, "content", chunk)
+            if not token:
+                continue
+            if self.first_token_at is None:
+                self.first_token_at = self._clock()
+            self._parts.append(token)
+            yield token
+        self.finished_at = self._clock()
+        observe("stage_seconds", self.total_time, stage="llm_stream")
+        inc("stage_calls_total", stage="llm_stream")
+        if self.time_to_first_token is not None:
+            observe("llm_first_token_seconds", self.time_to_first_token)
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
@@ -0,0 +1,140 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from metrics import inc, stage
+from resources import lazy_import, timed
+
+
+BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyRecorder:
+    # Latences par image et débit, pour comparer les moteurs de description local et distant
+    def __init__(self, window=500):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.images = 0
+        self.busy_seconds = 0.0
+
+    def record(self, seconds, images=1):
+        with self._lock:
+            self.images += images
+            self.busy_seconds += seconds
+            self._latencies.extend([seconds / images] * images)
+
+    def report(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            images, busy = self.images, self.busy_seconds
+        return {
+            "images": images,
+            "images_per_second": round(images / busy, 2) if busy else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Dernier moteur BLIP ayant réellement décrit des images : les rapports de performance ne
+# doivent pas charger (ni télécharger) le modèle à la place de l'utilisateur
+_last_used = None
+
+
+def active_captioner():
+    return _last_used
+
+
+class BlipCaptioner:
+    # Modèle BLIP chargé une fois par processus, inférence par lots sur CPU,
+    # quantification dynamique int8 optionnelle des couches linéaires
+    def __init__(self, model_name=BLIP_MODEL, quantize=False, num_threads=None,
+                 local_files_only=False, max_new_tokens=30):
+        torch = lazy_import("torch")
+        transformers = lazy_import("transformers")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.max_new_tokens = max_new_tokens
+        self.quantized = quantize
+        self.stats = LatencyRecorder()
+        self._lock = threading.Lock()
+
+        with timed(f"BLIP load {model_name}"):
+            self.processor = transformers.BlipProcessor.from_pretrained(
+                model_name, local_files_only=local_files_only
+            )
+            model = transformers.BlipForConditionalGeneration.from_pretrained(
+                model_name, local_files_only=local_files_only
+            )
+            model.eval()
+            if quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        # Poids figés après le chargement : taille calculée une fois
+        self.model_mb = self.model_size_mb()
+
+    def model_size_mb(self):
+        # Les poids quantifiés sont emballés par paires (poids, biais) dans le state_dict
+        size = 0
+        for value in self.model.state_dict().values():
+            for tensor in value if isinstance(value, tuple) else (value,):
+                if hasattr(tensor, "element_size"):
+                    size += tensor.numel() * tensor.element_size()
+        return round(size / (1024 * 1024), 1)
+
+    def caption_batch(self, images, batch_size=8):
+        global _last_used
+        _last_used = self
+        captions = []
+        for start in range(0, len(images), batch_size):
+            batch = [image.convert("RGB") for image in images[start:start + batch_size]]
+            began = time.perf_counter()
+            # generate() n'est pas réentrant sur un même modèle : un lot à la fois
+            with stage("captioning", backend="blip"), self._lock, self.torch.inference_mode():
+                inputs = self.processor(images=batch, return_tensors="pt")
+                output = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+            inc("images_total", len(batch), backend="blip")
+            captions.extend(self.processor.batch_decode(output, skip_special_tokens=True))
+            self.stats.record(time.perf_counter() - began, images=len(batch))
+        return captions
+
+    def report(self):
+        return {**self.stats.report(), "model_mb": self.model_mb, "peak_rss_mb": peak_rss_mb(),
+                "quantized": self.quantized}
+
+
+@lru_cache(maxsize=2)
+def get_blip_captioner(model_name=BLIP_MODEL, quantize=False, num_threads=None, local_files_only=False):
+    return BlipCaptioner(model_name, quantize=quantize, num_threads=num_threads,
+                         local_files_only=local_files_only)
+
+
+def captioner_from_env():
+    threads = os.getenv("BLIP_NUM_THREADS")
+    return get_blip_captioner(
+        os.getenv("BLIP_MODEL", BLIP_MODEL),
+        quantize=os.getenv("BLIP_QUANTIZE", "1") == "1",
+        num_threads=int(threads) if threads else None,
+        local_files_only=os.getenv("HF_HUB_OFFLINE") == "1",
+    )
@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+
+from languages import language_code
+from pdf_pipeline import SENTENCE_END
+from resources import lazy_import, timed
+
+
+MARIAN_MODEL_TEMPLATE = "Helsinki-NLP/opus-mt-{source}-{target}"
+
+
+class MarianModelCache:
+    # Modèles MarianMT chargés par paire de langues, éviction LRU au-delà de max_models
+    def __init__(self, max_models=3, quantize=False, num_threads=None,
+                 local_files_only=False, model_template=MARIAN_MODEL_TEMPLATE):
+        self.max_models = max_models
+        self.quantize = quantize
+        self.local_files_only = local_files_only
+        self.model_template = model_template
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        if num_threads:
+            lazy_import("torch").set_num_threads(num_threads)
+
+    def model_name(self, source_lang, target_lang):
+        return self.model_template.format(source=language_code(source_lang), target=language_code(target_lang))
+
+    def _load(self, name):
+        torch = lazy_import("torch")
+        transformers = lazy_import("transformers")
+        with timed(f"Marian load {name}"):
+            tokenizer = transformers.MarianTokenizer.from_pretrained(name, local_files_only=self.local_files_only)
+            model = transformers.MarianMTModel.from_pretrained(name, local_files_only=self.local_files_only)
+            model.eval()
+            if self.quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return tokenizer, model
+
+    def get(self, source_lang, target_lang):
+        name = self.model_name(source_lang, target_lang)
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            # Un seul chargement par modèle, même si plusieurs threads le demandent
+            loading = self._loading.setdefault(name, threading.Lock())
+        with loading:
+            with self._lock:
+                if name in self._models:
+                    return self._models[name]
+            entry = self._load(name)
+            with self._lock:
+                self._models[name] = entry
+                self._loading.pop(name, None)
+                while len(self._models) > self.max_models:
+                    self._models.popitem(last=False)
+            return entry
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+
+class MarianTranslator:
+    # Même interface que translate_text : traduction locale, phrase par phrase, par lots
+    def __init__(self, models, batch_size=16, max_new_tokens=512):
+        self.models = models
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+
+    def translate_sentences(self, sentences, source_lang, target_lang):
+        tokenizer, model = self.models.get(source_lang, target_lang)
+        torch = lazy_import("torch")
+        results = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = sentences[start:start + self.batch_size]
+            with torch.inference_mode():
+                inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+                output = model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+            results.extend(tokenizer.batch_decode(output, skip_special_tokens=True))
+        return results
+
+    def translate(self, text, target_lang, source_lang):
+        # Les sauts de ligne sont conservés ; chaque ligne est découpée en phrases
+        lines = text.split("\n")
+        sentences, layout = [], []
+        for line in lines:
+            parts = [p for p in SENTENCE_END.split(line.strip()) if p] if line.strip() else []
+            layout.append(len(parts))
+            sentences.extend(parts)
+        translated = iter(self.translate_sentences(sentences, source_lang, target_lang)) if sentences else iter(())
+        return "\n".join(" ".join(next(translated) for _ in range(count)) for count in layout)
+
+    # Adaptateur pour ChunkTranslationEngine (objet avec .translate(chunk))
+    def bind(self, source_lang, target_lang):
+        return _PairTranslator(self, source_lang, target_lang)
+
+
+class _PairTranslator:
+    def __init__(self, translator, source_lang, target_lang):
+        self.translator = translator
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+
+    def translate(self, text):
+        return self.translator.translate(text, self.target_lang, self.source_lang)
+
+
+class TranslationRouter:
+    # Choisit le moteur local ou distant par paire de langues ("fr-en,en-fr" ou "*")
+    def __init__(self, local_pairs=()):
+        self.local_pairs = {pair.strip().lower() for pair in local_pairs if pair.strip()}
+
+    def backend_for(self, source_lang, target_lang):
+        source, target = language_code(source_lang), language_code(target_lang)
+        if not source or source == target:
+            return "remote"
+        if "*" in self.local_pairs or f"{source}-{target}" in self.local_pairs:
+            return "marian"
+        return "remote"
+
+
+def router_from_env():
+    return TranslationRouter(os.getenv("LOCAL_TRANSLATION_PAIRS", "").split(","))
+
+
+def marian_from_env():
+    threads = os.getenv("MARIAN_NUM_THREADS")
+    models = MarianModelCache(
+        max_models=int(os.getenv("MARIAN_MAX_MODELS", "3")),
+        quantize=os.getenv("MARIAN_QUANTIZE", "1") == "1",
+        num_threads=int(threads) if threads else None,
+        local_files_only=os.getenv("HF_HUB_OFFLINE") == "1",
+    )
+    return MarianTranslator(models, batch_size=int(os.getenv("MARIAN_BATCH_SIZE", "16")))
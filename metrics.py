@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+
+
+# Bornes des histogrammes de durée (secondes), du ms à la minute
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Quantile estimé par la borne haute du seau qui le contient
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    # Compteurs, jauges et histogrammes en mémoire, par nom et par étiquettes ;
+    # exposés en texte Prometheus ou en JSON, sans service externe
+    def __init__(self, prefix="languepro"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    # Chronomètre une étape : durée, nombre d'appels et d'erreurs
+    @contextmanager
+    def stage(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("stage_errors_total", stage=name, **labels)
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=name, **labels)
+            self.inc("stage_calls_total", stage=name, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (h.count, h.sum, h.quantile(0.5), h.quantile(0.95))
+                          for key, h in self._histograms.items()}
+        snapshot = {"counters": [], "gauges": [], "histograms": []}
+        for (name, key), value in sorted(counters.items()):
+            snapshot["counters"].append({"name": name, "labels": dict(key), "value": value})
+        for (name, key), value in sorted(gauges.items()):
+            snapshot["gauges"].append({"name": name, "labels": dict(key), "value": value})
+        for (name, key), (count, total, p50, p95) in sorted(histograms.items()):
+            snapshot["histograms"].append({
+                "name": name, "labels": dict(key), "count": count, "sum": round(total, 6),
+                "mean": round(total / count, 6) if count else None, "p50": p50, "p95": p95,
+            })
+        return snapshot
+
+    # Vue par étape (temps, appels, erreurs) pour la page d'administration
+    def stage_summary(self):
+        snapshot = self.snapshot()
+        rows = {}
+        for entry in snapshot["histograms"]:
+            if entry["name"] != "stage_seconds":
+                continue
+            labels = dict(entry["labels"])
+            stage = labels.pop("stage")
+            label = stage + "".join(f" [{value}]" for value in labels.values())
+            rows[label] = {"appels": entry["count"], "total_s": round(entry["sum"], 3),
+                           "moyenne_ms": round(entry["mean"] * 1000, 1), "p50_s": entry["p50"],
+                           "p95_s": entry["p95"], "erreurs": 0}
+        for entry in snapshot["counters"]:
+            if entry["name"] == "stage_errors_total":
+                labels = dict(entry["labels"])
+                label = labels.pop("stage") + "".join(f" [{value}]" for value in labels.values())
+                rows.setdefault(label, {"appels": 0, "total_s": 0.0})["erreurs"] = entry["value"]
+        return rows
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def to_prometheus(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, (list(h.buckets), list(h.counts), h.sum, h.count))
+                                for key, h in self._histograms.items())
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {self.prefix}_{name} {self._help[name]}")
+                lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        for (name, key), value in counters:
+            declare(name, "counter")
+            lines.append(f"{self.prefix}_{name}{_format_labels(key)} {value}")
+        for (name, key), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{self.prefix}_{name}{_format_labels(key)} {value}")
+        for (name, key), (buckets, counts, total, count) in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + [float("inf")], counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.prefix}_{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.prefix}_{name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.prefix}_{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Taille en octets pour bytes_total : le texte compte encodé en UTF-8 (et non en caractères)
+def byte_size(data):
+    return len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+
+
+# Registre unique du processus, partagé par tous les modules et toutes les sessions
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("stage_seconds", "Durée des étapes du pipeline (extraction, découpage, traduction, rendu, TTS, description)")
+REGISTRY.describe("stage_calls_total", "Nombre d'exécutions par étape")
+REGISTRY.describe("stage_errors_total", "Nombre d'exécutions en erreur par étape")
+REGISTRY.describe("bytes_total", "Volume traité par étape (octets en entrée et en sortie)")
+REGISTRY.describe("tokens_total", "Tokens estimés envoyés aux modèles")
+REGISTRY.describe("cache_lookups_total", "Consultations des caches (résultat hit/miss)")
+REGISTRY.describe("translation_memory_mismatches_total", "Réponses non alignées sur les phrases (morceau retraduit en entier)")
+REGISTRY.describe("retries_total", "Nouvelles tentatives après erreur")
+
+stage = REGISTRY.stage
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+
+
+def _handler(registry):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, content_type = registry.to_json().encode("utf-8"), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, content_type = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MetricsHandler
+
+
+# Point d'accès /metrics (Prometheus) et /metrics.json dans un thread du processus
+# Streamlit : un seul serveur par processus, quel que soit le nombre de reruns
+@lru_cache(maxsize=None)
+def start_metrics_server(port, host="127.0.0.1"):
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _handler(REGISTRY))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def metrics_server_from_env():
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    return start_metrics_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
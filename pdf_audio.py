@@ -0,0 +1,158 @@
+import io
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import byte_size, inc, observe
+from tts_worker import _default_engine_factory, find_voice
+
+
+# Moteur propre à chaque processus du pool (pyttsx3 n'est pas partageable entre processus)
+_engine = None
+_voice_ids = {}
+
+
+def _init_worker(engine_factory):
+    global _engine
+    _engine = engine_factory()
+    _voice_ids.clear()
+
+
+def synthesize_segment(text, lang=None, rate=150, suffix=".wav"):
+    if lang not in _voice_ids:
+        voice = find_voice(_engine.getProperty("voices"), lang)
+        _voice_ids[lang] = voice.id if voice is not None else None
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="pdf_segment_")
+    os.close(fd)
+    try:
+        _engine.setProperty("rate", rate)
+        if _voice_ids[lang] is not None:
+            _engine.setProperty("voice", _voice_ids[lang])
+        _engine.save_to_file(text, path)
+        _engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+# Flottant IEEE 754 étendu (80 bits) : fréquence d'échantillonnage des fichiers AIFF
+def _extended(data):
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+# Trames PCM d'un AIFF (moteur nsss de macOS), converties dans l'ordre des octets du WAV
+def _aiff_frames(data):
+    compressed = data[8:12] == b"AIFC"
+    position, comm, sound = 12, None, None
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        size = struct.unpack(">I", data[position + 4:position + 8])[0]
+        body = data[position + 8:position + 8 + size]
+        if chunk_id == b"COMM":
+            comm = body
+        elif chunk_id == b"SSND":
+            offset = struct.unpack(">I", body[:4])[0]
+            sound = body[8 + offset:]
+        position += 8 + size + (size & 1)
+    if comm is None or sound is None:
+        raise ValueError("fichier AIFF incomplet")
+    channels, _, bits = struct.unpack(">hIh", comm[:8])
+    rate = round(_extended(comm[8:18]))
+    encoding = comm[18:22] if compressed else b"NONE"
+    width = (bits + 7) // 8
+    sound = sound[:len(sound) - len(sound) % (channels * width)]
+    if encoding == b"sowt":
+        frames = sound
+    elif encoding != b"NONE":
+        raise ValueError(f"AIFF compressé non pris en charge ({encoding!r})")
+    elif width == 1:
+        # 8 bits : signé en AIFF, non signé en WAV
+        frames = sound.translate(bytes((i + 128) & 0xFF for i in range(256)))
+    else:
+        swapped = bytearray(len(sound))
+        for i in range(width):
+            swapped[i::width] = sound[width - 1 - i::width]
+        frames = bytes(swapped)
+    return (channels, width, rate), frames
+
+
+def _pcm(data):
+    if data[:4] == b"RIFF":
+        with wave.open(io.BytesIO(data), "rb") as part:
+            return part.getparams()[:2] + (part.getframerate(),), part.readframes(part.getnframes())
+    if data[:4] == b"FORM" and data[8:12] in (b"AIFF", b"AIFC"):
+        return _aiff_frames(data)
+    raise ValueError("format audio non reconnu (WAV ou AIFF attendu)")
+
+
+# Assemble des segments WAV ou AIFF de même format en un seul WAV ; des formats différents
+# lèvent ValueError plutôt que de produire un fichier illisible
+def join_audio(segments):
+    params, frames = None, []
+    for data in segments:
+        part_params, part_frames = _pcm(data)
+        if params is None:
+            params = part_params
+        elif part_params != params:
+            raise ValueError(f"segments audio de formats différents : {params} / {part_params}")
+        frames.append(part_frames)
+    if params is None:
+        return b""
+    output = io.BytesIO()
+    with wave.open(output, "wb") as joined:
+        joined.setnchannels(params[0])
+        joined.setsampwidth(params[1])
+        joined.setframerate(params[2])
+        joined.writeframes(b"".join(frames))
+    return output.getvalue()
+
+
+class SegmentedSynthesizer:
+    # Synthèse des segments en parallèle dans un pool de processus ; les segments sont
+    # rendus dans l'ordre dès qu'ils sont prêts pour une lecture anticipée
+    def __init__(self, max_workers=None, rate=150, engine_factory=_default_engine_factory):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.rate = rate
+        # spawn : un fork depuis le serveur Streamlit (multi-thread) peut hériter de verrous
+        # tenus par d'autres threads et bloquer les processus enfants
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_init_worker, initargs=(engine_factory,),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    # Métriques relevées côté parent (les processus du pool ont chacun leur registre) :
+    # durée de la soumission au résultat, attente dans le pool comprise
+    def _collect(self, submitted_at, future):
+        audio = future.result()
+        observe("stage_seconds", time.perf_counter() - submitted_at, stage="tts_segment")
+        inc("stage_calls_total", stage="tts_segment")
+        inc("bytes_total", len(audio), stage="tts_segment", direction="out")
+        return audio
+
+    def synthesize(self, segments, lang=None, max_in_flight=None):
+        window = max_in_flight or self.max_workers * 2
+        pending = deque()
+        for segment in segments:
+            if not segment.strip():
+                continue
+            inc("bytes_total", byte_size(segment), stage="tts_segment", direction="in")
+            pending.append((time.perf_counter(),
+                            self._executor.submit(synthesize_segment, segment, lang, self.rate)))
+            if len(pending) >= window:
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
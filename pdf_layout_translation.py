@@ -0,0 +1,101 @@
+import re
+
+from pdf_pipeline import iter_chunks, open_pdf
+from resources import lazy_import
+from translation_cache import normalize_text
+
+
+# Blocs sans contenu à traduire : numéros de page, dates, montants, ponctuation seule
+UNTRANSLATABLE = re.compile(r"^[\W\d_]*$")
+
+
+def _page_blocks(page):
+    # Blocs texte avec leur rectangle et la taille de police dominante
+    for block in page.get_text("dict", sort=True)["blocks"]:
+        if block.get("type") != 0:
+            continue
+        lines, sizes = [], []
+        for line in block["lines"]:
+            spans = line["spans"]
+            lines.append("".join(span["text"] for span in spans))
+            sizes.extend((span["size"], len(span["text"])) for span in spans)
+        text = "\n".join(lines)
+        size = max(sizes, key=lambda item: item[1])[0] if sizes else 11
+        yield block["bbox"], text, size
+
+
+def _insert_fitted(page, rect, text, size, fontfile, min_size=4):
+    # On réduit la police jusqu'à ce que la traduction tienne dans le rectangle d'origine
+    while size >= min_size:
+        if page.insert_textbox(rect, text, fontsize=size, fontname="dejavu", fontfile=fontfile) >= 0:
+            return True
+        size *= 0.85
+    # Sinon le bloc déborde vers le bas de la page plutôt que de perdre le texte
+    x0, y0, x1, _ = rect
+    page.insert_textbox((x0, y0, x1, page.rect.y1), text, fontsize=min_size, fontname="dejavu", fontfile=fontfile)
+    return False
+
+
+class LayoutTranslationStats:
+    def __init__(self):
+        self.pages = 0
+        self.total_blocks = 0
+        self.skipped_blocks = 0
+        self.unique_blocks = 0
+        self.overflow_blocks = 0
+
+    def as_dict(self):
+        translatable = self.total_blocks - self.skipped_blocks
+        return {
+            "pages": self.pages,
+            "total_blocks": self.total_blocks,
+            "skipped_blocks": self.skipped_blocks,
+            "unique_blocks": self.unique_blocks,
+            "duplicate_blocks": translatable - self.unique_blocks,
+            "overflow_blocks": self.overflow_blocks,
+            "translation_savings": round(1 - self.unique_blocks / translatable, 3) if translatable else 0.0,
+        }
+
+
+# Traduit un PDF bloc par bloc en conservant sa mise en page : chaque bloc unique n'est
+# traduit qu'une fois (en-têtes, pieds de page répétés...), page après page
+def translate_pdf_layout(source, engine, source_lang, target_lang, fontfile="DejaVuSans.ttf",
+                         max_chars=4500, **namespace):
+    stats = LayoutTranslationStats()
+    translations = {}
+    with open_pdf(source) as doc:
+        keep_images = lazy_import("fitz").PDF_REDACT_IMAGE_NONE
+        for page in doc:
+            stats.pages += 1
+            blocks = []
+            new_texts = []
+            for rect, text, size in _page_blocks(page):
+                stats.total_blocks += 1
+                key = normalize_text(text)
+                if UNTRANSLATABLE.match(key):
+                    stats.skipped_blocks += 1
+                    continue
+                if key not in translations:
+                    translations[key] = None
+                    new_texts.append(key)
+                blocks.append((rect, key, size))
+
+            if new_texts:
+                stats.unique_blocks += len(new_texts)
+                # Les blocs démesurés sont découpés, traduits puis recollés
+                pieces = [list(iter_chunks([text], max_chars=max_chars)) for text in new_texts]
+                flat = [piece for group in pieces for piece in group]
+                translated = iter(engine.translate_chunks(flat, source_lang, target_lang, **namespace))
+                for text, group in zip(new_texts, pieces):
+                    translations[text] = " ".join(next(translated) for _ in group)
+
+            if not blocks:
+                continue
+            for rect, _, _ in blocks:
+                page.add_redact_annot(rect)
+            page.apply_redactions(images=keep_images)
+            for rect, key, size in blocks:
+                if not _insert_fitted(page, rect, translations[key], size, fontfile):
+                    stats.overflow_blocks += 1
+
+        return doc.tobytes(garbage=3, deflate=True), stats.as_dict()
@@ -0,0 +1,120 @@
+import re
+import time
+from contextlib import contextmanager
+
+from metrics import byte_size, inc, observe, stage
+from resources import lazy_import
+
+
+SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+# Ouvre un PDF sans recopier l'upload : chemin, bytes ou fichier en mémoire (UploadedFile)
+@contextmanager
+def open_pdf(source):
+    fitz = lazy_import("fitz")  # PyMuPDF
+    if isinstance(source, str):
+        doc = fitz.open(source)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(stream=source.getbuffer(), filetype="pdf")
+    try:
+        yield doc
+    finally:
+        doc.close()
+
+
+# Une page à la fois : le texte de la page précédente peut être libéré
+def iter_page_texts(doc):
+    for page in doc:
+        with stage("pdf_extraction"):
+            text = page.get_text()
+        inc("bytes_total", byte_size(text), stage="pdf_extraction", direction="out")
+        yield text
+
+
+# Blocs de texte (paragraphes) dans l'ordre de lecture, page par page
+def iter_text_blocks(doc):
+    for page in doc:
+        with stage("pdf_extraction"):
+            blocks = page.get_text("blocks", sort=True)
+        for block in blocks:
+            # block = (x0, y0, x1, y1, texte, numéro, type) ; type 1 = image
+            if block[6] != 0:
+                continue
+            text = " ".join(block[4].split())
+            if text:
+                inc("bytes_total", byte_size(text), stage="pdf_extraction", direction="out")
+                yield text
+
+
+def _split_oversized(text, max_chars):
+    # Phrases d'abord, puis mots, puis coupe franche pour les « mots » démesurés
+    pieces = []
+    for sentence in SENTENCE_END.split(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        current = ""
+        for word in sentence.split(" "):
+            while len(word) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(word[:max_chars])
+                word = word[max_chars:]
+            if current and len(current) + 1 + len(word) > max_chars:
+                pieces.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            pieces.append(current)
+    return pieces
+
+
+# Regroupe paragraphes et phrases en morceaux d'au plus max_chars, sans couper de mot
+# (le temps mesuré exclut la lecture des blocs en amont et l'attente du consommateur)
+def iter_chunks(blocks, max_chars=4500, separator="\n"):
+    parts = []
+    size = 0
+    elapsed = 0.0
+    for block in blocks:
+        start = time.perf_counter()
+        pieces = [block] if len(block) <= max_chars else _split_oversized(block, max_chars)
+        for piece in pieces:
+            extra = len(piece) + (len(separator) if parts else 0)
+            if parts and size + extra > max_chars:
+                chunk = separator.join(parts)
+                elapsed += time.perf_counter() - start
+                inc("chunks_total")
+                yield chunk
+                start = time.perf_counter()
+                parts = []
+                size = 0
+                extra = len(piece)
+            parts.append(piece)
+            size += extra
+        elapsed += time.perf_counter() - start
+    if parts:
+        inc("chunks_total")
+        yield separator.join(parts)
+    observe("stage_seconds", elapsed, stage="chunking")
+    inc("stage_calls_total", stage="chunking")
+
+
+def iter_pdf_chunks(doc, max_chars=4500):
+    return iter_chunks(iter_text_blocks(doc), max_chars=max_chars)
+
+
+# Aperçu borné du texte : ne lit que les premières pages nécessaires
+def preview_text(doc, max_chars=5000):
+    parts = []
+    size = 0
+    for text in iter_page_texts(doc):
+        parts.append(text[:max_chars - size])
+        size += len(parts[-1])
+        if size >= max_chars:
+            break
+    return "".join(parts)
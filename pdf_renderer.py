@@ -0,0 +1,170 @@
+from metrics import byte_size, inc, stage
+from resources import lazy_import, timed
+
+
+class _ListBuffer:
+    # Tampon du document en liste : pyfpdf 1.x fait self.buffer += ... à chaque objet,
+    # ce qui recopie toute la chaîne (coût quadratique sur les gros documents)
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+
+    def __iadd__(self, text):
+        self._parts.append(text)
+        self._length += len(text)
+        return self
+
+    def __len__(self):
+        return self._length
+
+    def getvalue(self):
+        return "".join(self._parts)
+
+
+class _GlyphSubset(list):
+    # Table des glyphes utilisés, sans doublons : pyfpdf y ajoute chaque caractère écrit,
+    # puis la parcourt (et y cherche avec « in ») au moment d'incorporer la police
+    def __init__(self, codes=()):
+        super().__init__()
+        self._seen = set()
+        for code in codes:
+            self.append(code)
+
+    def append(self, code):
+        if code not in self._seen:
+            self._seen.add(code)
+            super().append(code)
+
+    def __contains__(self, code):
+        return code in self._seen
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._seen = set(self)
+
+
+# Même découpage que FPDF.multi_cell (alignement justifié, sans bordure) mais avec une
+# lecture directe de la table des largeurs : multi_cell appelle get_string_width pour
+# chaque caractère, ce qui domine le temps de rendu des gros documents
+def _multi_cell_unicode(pdf, h, txt):
+    txt = pdf.normalize_text(txt)
+    cw = pdf.current_font['cw']
+    known = len(cw)
+    missing = pdf.current_font['desc'].get('MissingWidth') or 500
+    w = pdf.w - pdf.r_margin - pdf.x
+    wmax = (w - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+    s = txt.replace("\r", '')
+    nb = len(s)
+    if nb > 0 and s[nb - 1] == "\n":
+        nb -= 1
+    sep = -1
+    i = j = 0
+    l = ls = 0
+    ns = 0
+    while i < nb:
+        c = s[i]
+        if c == "\n":
+            if pdf.ws > 0:
+                pdf.ws = 0
+                pdf._out('0 Tw')
+            pdf.cell(w, h, s[j:i], 0, 2, 'J', 0)
+            i += 1
+            sep = -1
+            j = i
+            l = 0
+            ns = 0
+            continue
+        if c == ' ':
+            sep = i
+            ls = l
+            ns += 1
+        code = ord(c)
+        l += cw[code] if code < known else missing
+        if l > wmax:
+            if sep == -1:
+                if i == j:
+                    i += 1
+                if pdf.ws > 0:
+                    pdf.ws = 0
+                    pdf._out('0 Tw')
+                pdf.cell(w, h, s[j:i], 0, 2, 'J', 0)
+            else:
+                pdf.ws = (wmax - ls) / 1000.0 * pdf.font_size / (ns - 1) if ns > 1 else 0
+                pdf._out('%.3f Tw' % (pdf.ws * pdf.k))
+                pdf.cell(w, h, s[j:sep], 0, 2, 'J', 0)
+                i = sep + 1
+            sep = -1
+            j = i
+            l = 0
+            ns = 0
+        else:
+            i += 1
+    if pdf.ws > 0:
+        pdf.ws = 0
+        pdf._out('0 Tw')
+    pdf.cell(w, h, s[j:i], 0, 2, 'J', 0)
+    pdf.x = pdf.l_margin
+
+
+class PDFRenderer:
+    # Police chargée une seule fois par processus ; chaque document ne recopie que
+    # l'état qui lui est propre (table de sous-ensemble des glyphes)
+    def __init__(self, font_path="DejaVuSans.ttf", family="DejaVu", size=12,
+                 line_height=10, margin=15):
+        self.font_path = font_path
+        self.family = family
+        self.size = size
+        self.line_height = line_height
+        self.margin = margin
+        self._FPDF = lazy_import("fpdf").FPDF
+        with timed(f"police {font_path}"):
+            template = self._FPDF()
+            template.add_font(family, '', font_path, uni=True)
+        self._fonts = template.fonts
+        self._font_files = template.font_files
+        # pyfpdf 1.x : polices sous forme de dictionnaires, recopiables ; sinon (fpdf2) add_font classique
+        self._reuse_fonts = all(isinstance(font, dict) for font in self._fonts.values())
+
+    def _new_document(self):
+        pdf = self._FPDF()
+        if isinstance(pdf.buffer, str):
+            pdf.buffer = _ListBuffer()
+        if self._reuse_fonts:
+            for key, font in self._fonts.items():
+                entry = dict(font)  # 'cw' (métriques) est partagé en lecture seule
+                entry["i"] = len(pdf.fonts) + 1
+                entry["subset"] = _GlyphSubset(font["subset"])
+                pdf.fonts[key] = entry
+            for key, info in self._font_files.items():
+                pdf.font_files[key] = dict(info)
+        else:
+            pdf.add_font(self.family, '', self.font_path, uni=True)
+        pdf.set_auto_page_break(auto=True, margin=self.margin)
+        pdf.add_page()
+        pdf.set_font(self.family, '', self.size)
+        return pdf
+
+    # paragraphs : texte complet ou itérable de paragraphes (les \n internes sont respectés)
+    def render(self, paragraphs):
+        if isinstance(paragraphs, str):
+            paragraphs = [paragraphs]
+        with stage("pdf_render"):
+            pdf = self._new_document()
+            fast = self._reuse_fonts and getattr(pdf, "unifontsubset", False)
+            size = 0
+            for paragraph in paragraphs:
+                size += byte_size(paragraph)
+                # Un seul passage par paragraphe au lieu d'un multi_cell par ligne
+                if fast:
+                    _multi_cell_unicode(pdf, self.line_height, paragraph)
+                else:
+                    pdf.multi_cell(0, self.line_height, paragraph)
+            pdf.close()
+            if isinstance(pdf.buffer, _ListBuffer):
+                data = pdf.buffer.getvalue().encode("latin1")
+            else:
+                data = bytes(pdf.output())
+        inc("bytes_total", size, stage="pdf_render", direction="in")
+        inc("bytes_total", len(data), stage="pdf_render", direction="out")
+        inc("pages_total", pdf.page, stage="pdf_render")
+        return data
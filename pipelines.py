@@ -0,0 +1,385 @@
+import base64
+import os
+import threading
+import time
+
+from audio_cache import audio_cache_from_env, synthesize_incremental
+from batch_translation import translate_batch
+from chunk_translation import ChunkTranslationEngine
+from groq_client import estimate_tokens, get_gateway
+from image_preprocess import CaptionCache, dhash, load_image, preprocess_image
+from llm_streaming import TokenStream
+from local_captioning import LatencyRecorder, captioner_from_env
+from marian_translation import marian_from_env, router_from_env
+from metrics import byte_size, inc, stage
+from pdf_audio import SegmentedSynthesizer, join_audio
+from pdf_layout_translation import translate_pdf_layout
+from pdf_pipeline import iter_pdf_chunks, open_pdf
+from pdf_renderer import PDFRenderer
+from resources import get_groq_client, get_llm, lazy_import
+from tracing import traced
+from translation_cache import cache_from_env, make_cache_key
+from translation_memory import LeverageStats, memory_from_env
+from tts_worker import TTSWorker, _default_engine_factory
+
+
+# Pipelines de l'application, sans Streamlit : App.py les appelle depuis ses pages,
+# benchmarks.py et les traitements hors ligne les construisent avec des moteurs factices.
+# Chaque ressource (moteurs, caches, clients) est construite au premier usage puis partagée
+
+GROQ_TEXT_MODEL = "llama3-8b-8192"
+GROQ_VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+
+def human_message(content):
+    return lazy_import("langchain_core.messages").HumanMessage(content=content)
+
+
+def llm_tokens(messages):
+    return estimate_tokens("".join(message.content for message in messages), completion_tokens=512)
+
+
+def build_translation_prompt(text, target_lang, source_lang=None, hints=()):
+    if source_lang:
+        prompt = f"Traduis du {source_lang} vers le {target_lang} : {text}"
+    else:
+        prompt = f"Traduis ce texte en {target_lang} : {text}"
+    if hints:
+        # Traductions proches déjà validées : le modèle garde la même terminologie
+        examples = "\n".join(f"- {hint.source} => {hint.translation}" for hint in hints)
+        prompt = f"Traductions de référence (textes proches) :\n{examples}\n\n{prompt}"
+    return prompt
+
+
+def _google_translator_factory():
+    GoogleTranslator = lazy_import("deep_translator").GoogleTranslator
+    return lambda source, target: GoogleTranslator(source=source, target=target)
+
+
+class Pipelines:
+    # Les paramètres sont des fabriques appelées au premier usage (valeurs par défaut :
+    # configuration par variables d'environnement, services réels) ; l'environnement est lu
+    # à la construction, après le chargement du .env par App.py
+    def __init__(self, llm=get_llm, vision_client=get_groq_client, gateway=get_gateway,
+                 translator_factory=_google_translator_factory, tts_engine_factory=_default_engine_factory,
+                 captioner=captioner_from_env, translation_cache=cache_from_env,
+                 translation_memory=memory_from_env, audio_cache=audio_cache_from_env,
+                 marian=marian_from_env, router=router_from_env, font_path="DejaVuSans.ttf",
+                 text_model=GROQ_TEXT_MODEL, vision_model=GROQ_VISION_MODEL):
+        self.text_model = text_model
+        self.vision_model = vision_model
+        self.tts_engine_factory = tts_engine_factory
+        # Préparation des images pour le modèle de vision (taille, format, type MIME)
+        self.image_max_edge = int(os.getenv("CAPTION_IMAGE_MAX_EDGE", "1024"))
+        self.image_format = os.getenv("CAPTION_IMAGE_FORMAT", "JPEG")
+        self.image_quality = int(os.getenv("CAPTION_IMAGE_QUALITY", "85"))
+        # Phrases reprises telles quelles de la mémoire de traduction au-dessus de ce seuil (1.0 = identiques)
+        self.reuse_threshold = float(os.getenv("TRANSLATION_MEMORY_REUSE_THRESHOLD", "1.0"))
+        self.pdf_audio_segment_chars = int(os.getenv("PDF_AUDIO_SEGMENT_CHARS", "1500"))
+        self._llm = llm
+        self._factories = {
+            "vision_client": vision_client,
+            "gateway": gateway,
+            "translator_factory": translator_factory,
+            "captioner": captioner,
+            "translation_cache": translation_cache,
+            "translation_memory": translation_memory,
+            "audio_cache": audio_cache,
+            "marian": marian,
+            "router": router,
+            "renderer": lambda: PDFRenderer(font_path),
+            "remote_caption_stats": LatencyRecorder,
+            "tts_worker": lambda: TTSWorker(rate=150, engine_factory=self.tts_engine_factory),
+            "pdf_synthesizer": lambda: SegmentedSynthesizer(
+                max_workers=int(os.getenv("PDF_AUDIO_WORKERS", "0")) or None,
+                engine_factory=self.tts_engine_factory),
+        }
+        self._components = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory=None):
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = (factory or self._factories[name])()
+        return component
+
+    # Arrêt des pools et threads déjà construits (bancs d'essai, traitements hors ligne)
+    def close(self):
+        with self._lock:
+            components = list(self._components.values())
+            self._components.clear()
+        for component in components:
+            # Les clients partagés (Groq, passerelle) restent ouverts pour le reste du processus
+            if isinstance(component, (ChunkTranslationEngine, SegmentedSynthesizer)):
+                component.shutdown()
+            elif isinstance(component, TTSWorker):
+                component.close()
+
+    def gateway(self):
+        return self._get("gateway")
+
+    def translation_cache(self):
+        return self._get("translation_cache")
+
+    def translation_memory(self):
+        return self._get("translation_memory")
+
+    def audio_cache(self):
+        return self._get("audio_cache")
+
+    def pdf_renderer(self):
+        return self._get("renderer")
+
+    def remote_caption_stats(self):
+        return self._get("remote_caption_stats")
+
+    def tts_worker(self):
+        return self._get("tts_worker")
+
+    def pdf_synthesizer(self):
+        return self._get("pdf_synthesizer")
+
+    # Légendes déjà générées, retrouvées par empreinte perceptuelle (un cache par moteur)
+    def caption_cache(self, backend):
+        return self._get(f"caption_cache:{backend}", lambda: CaptionCache(
+            max_distance=int(os.getenv("CAPTION_CACHE_MAX_DISTANCE", "4"))))
+
+    # --- LLM (tous les appels Groq passent par la passerelle commune) ---
+
+    def invoke_llm(self, messages):
+        return self.gateway().call(
+            self.text_model, lambda: self._llm(self.text_model).invoke(messages), tokens=llm_tokens(messages)
+        ).content
+
+    def stream_llm(self, messages, on_complete=None):
+        chunks = self.gateway().stream(
+            self.text_model, lambda: self._llm(self.text_model).stream(messages), tokens=llm_tokens(messages)
+        )
+        return TokenStream(chunks, on_complete=on_complete)
+
+    # --- Traduction ---
+
+    def use_local_translation(self, source_lang, target_lang):
+        return self._get("router").backend_for(source_lang, target_lang) == "marian"
+
+    def marian_translator(self):
+        return self._get("marian")
+
+    # Moteur de traduction par morceaux en parallèle, partagé par toutes les sessions
+    def chunk_engine(self, backend="google"):
+        if backend == "marian":
+            return self._get("chunk_engine:marian", lambda: ChunkTranslationEngine(
+                lambda source, target: self.marian_translator().bind(source, target),
+                max_workers=int(os.getenv("MARIAN_WORKERS", "2")),
+                max_retries=0,
+                cache=self.translation_cache(),
+                memory=self.translation_memory(),
+                reuse_threshold=self.reuse_threshold,
+            ))
+        return self._get("chunk_engine:google", lambda: ChunkTranslationEngine(
+            self._get("translator_factory"),
+            max_workers=int(os.getenv("PDF_TRANSLATION_WORKERS", "8")),
+            max_retries=int(os.getenv("PDF_TRANSLATION_RETRIES", "3")),
+            cache=self.translation_cache(),
+            memory=self.translation_memory(),
+            reuse_threshold=self.reuse_threshold,
+        ))
+
+    # Moteur et espace de cache pour une paire de langues de PDF
+    def pdf_translation_backend(self, source_lang, target_lang):
+        if self.use_local_translation(source_lang, target_lang):
+            model = self.marian_translator().models.model_name(source_lang, target_lang)
+            return self.chunk_engine("marian"), {"backend": "marian", "model": model}
+        return self.chunk_engine(), {"backend": "google", "model": "deep_translator"}
+
+    def translation_hints(self, text, target_lang, source_lang=None):
+        return self.translation_memory().similar(source_lang, target_lang, text, limit=3,
+                                                 backend="groq", model=self.text_model)
+
+    def remember_translation(self, text, target_lang, source_lang, translation):
+        self.translation_memory().add(source_lang, target_lang, text, translation,
+                                      backend="groq", model=self.text_model)
+        return translation
+
+    @traced(name="TranslationChain")
+    def translate_text(self, text, target_lang, source_lang=None):
+        if self.use_local_translation(source_lang, target_lang):
+            marian = self.marian_translator()
+            return self.translation_cache().get_or_compute(
+                "marian", marian.models.model_name(source_lang, target_lang), source_lang, target_lang, text,
+                lambda: marian.translate(text, target_lang, source_lang)
+            )
+
+        def compute():
+            prompt = build_translation_prompt(text, target_lang, source_lang,
+                                              self.translation_hints(text, target_lang, source_lang))
+            return self.remember_translation(text, target_lang, source_lang,
+                                             self.invoke_llm([human_message(prompt)]))
+        return self.translation_cache().get_or_compute(
+            "groq", self.text_model, source_lang, target_lang, text, compute)
+
+    # Une seule requête pour plusieurs textes et plusieurs langues cibles (réponse JSON)
+    @traced(name="BatchTranslation")
+    def translate_texts(self, texts, target_langs, source_lang=None):
+        return translate_batch(
+            texts, target_langs,
+            invoke=lambda prompt: self.invoke_llm([human_message(prompt)]),
+            source_lang=source_lang,
+            fallback=self.translate_text,
+            cache=self.translation_cache(),
+            model=self.text_model,
+        )
+
+    # Version en flux : les tokens s'affichent dès leur arrivée, le texte complet alimente le cache
+    @traced(name="TranslationStream")
+    def translate_text_stream(self, text, target_lang, source_lang=None):
+        if self.use_local_translation(source_lang, target_lang):
+            # Pas de flux de tokens en local : la traduction arrive en une fois
+            yield self.translate_text(text, target_lang, source_lang)
+            return
+        cache = self.translation_cache()
+        key = make_cache_key("groq", self.text_model, source_lang, target_lang, text)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        prompt = build_translation_prompt(text, target_lang, source_lang,
+                                          self.translation_hints(text, target_lang, source_lang))
+        yield from self.stream_llm([human_message(prompt)], on_complete=lambda result: cache.set(
+            key, self.remember_translation(text, target_lang, source_lang, result)))
+
+    # Traduction d'un PDF au fil de l'extraction : les morceaux partent dès qu'ils sont prêts
+    @traced(name="PDFTranslationStream")
+    def translate_pdf_document(self, pdf, source_lang, target_lang, max_chars=4500, progress=None, leverage=None):
+        with open_pdf(pdf) as doc:
+            chunks = iter_pdf_chunks(doc, max_chars=max_chars)
+            engine, namespace = self.pdf_translation_backend(source_lang, target_lang)
+            translated = []
+            for part in engine.translate_stream(chunks, source_lang, target_lang, leverage=leverage, **namespace):
+                translated.append(part)
+                if progress is not None:
+                    progress(len(translated), unit="morceaux")
+            return "\n".join(translated)
+
+    # Traduction bloc par bloc qui conserve la géométrie des pages
+    @traced(name="PDFLayoutTranslation")
+    def translate_pdf_with_layout(self, pdf, source_lang, target_lang):
+        engine, namespace = self.pdf_translation_backend(source_lang, target_lang)
+        return translate_pdf_layout(pdf, engine, source_lang, target_lang, **namespace)
+
+    # --- Chatbot ---
+
+    # Résumé glissant des anciens tours du chatbot
+    @traced(name="ChatHistorySummary")
+    def summarize_history(self, previous_summary, messages):
+        HumanMessage = lazy_import("langchain_core.messages").HumanMessage
+        transcript = "\n".join(
+            f"{'Utilisateur' if isinstance(m, HumanMessage) else 'Assistant'} : {m.content}" for m in messages
+        )
+        prompt = (
+            "Résume de façon concise la conversation ci-dessous en conservant les faits, "
+            "les préférences et les décisions utiles pour la suite.\n"
+            f"Résumé existant : {previous_summary or 'aucun'}\n\nNouveaux échanges :\n{transcript}"
+        )
+        return self.invoke_llm([human_message(prompt)])
+
+    @traced(name="ChatbotStream")
+    def chat_stream(self, messages):
+        yield from self.stream_llm(messages)
+
+    # --- Audio ---
+
+    @traced(name="TextToAudio")
+    def generate_audio(self, text, lang):
+        # Retourne l'audio en mémoire (WAV) : seules les phrases nouvelles ou modifiées sont
+        # synthétisées, les autres sont relues depuis le cache puis assemblées
+        worker = self.tts_worker()
+        return synthesize_incremental(text, lang, worker.submit, self.audio_cache(),
+                                      voice=worker.voice_id(lang), rate=worker.rate)
+
+    @traced(name="PDFToAudio")
+    def read_pdf_to_audio(self, segments):
+        # Rend l'audio de chaque segment dans l'ordre, dès qu'il est synthétisé
+        yield from self.pdf_synthesizer().synthesize(segments)
+
+    # --- Description d'images ---
+
+    def encode_image_to_base64(self, image, original=None):
+        data, mime = preprocess_image(image, max_edge=self.image_max_edge, fmt=self.image_format,
+                                      quality=self.image_quality, original=original)
+        return base64.b64encode(data).decode("utf-8"), mime
+
+    def caption_remote(self, image, original=None):
+        img_b64, mime = self.encode_image_to_base64(image, original)
+        messages = [
+            {"type": "text", "text": "Describe this image."},
+            {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{img_b64}"}}
+        ]
+
+        started = time.perf_counter()
+        inc("bytes_total", byte_size(img_b64), stage="captioning", direction="in")
+        with stage("captioning", backend="groq"):
+            response = self.gateway().call(
+                self.vision_model,
+                lambda: self._get("vision_client").chat.completions.create(
+                    model=self.vision_model,
+                    messages=[{"role": "user", "content": messages}]
+                ),
+                tokens=estimate_tokens("Describe this image.", completion_tokens=512) + 1500,  # ~ coût d'une image
+            )
+        inc("images_total", backend="groq")
+        self.remote_caption_stats().record(time.perf_counter() - started)
+        return response.choices[0].message.content
+
+    # images : contenu brut des fichiers (octets), décrits dans l'ordre
+    @traced(name="ImageCaptioning")
+    def generate_captions(self, images_data, backend="groq"):
+        images = [load_image(data) for data in images_data]
+        hashes = [dhash(image) for image in images]
+        caption_cache = self.caption_cache(backend)
+        captions = [caption_cache.get(image_hash) for image_hash in hashes]
+
+        missing = [i for i, caption in enumerate(captions) if caption is None]
+        inc("cache_lookups_total", len(captions) - len(missing), cache="caption", result="hit")
+        inc("cache_lookups_total", len(missing), cache="caption", result="miss")
+        if missing:
+            if backend == "blip":
+                # Inférence par lots : toutes les images manquantes en un passage
+                new_captions = self._get("captioner").caption_batch([images[i] for i in missing])
+            else:
+                new_captions = [self.caption_remote(images[i], images_data[i]) for i in missing]
+            for i, caption in zip(missing, new_captions):
+                captions[i] = caption
+                caption_cache.set(hashes[i], caption)
+        return captions
+
+    # --- Tâches en arrière-plan (progress : rappel de JobManager) ---
+
+    def pdf_translation_job(self, progress, pdf_data, source_lang, target_lang, keep_layout=False):
+        if keep_layout:
+            pdf_bytes, layout_stats = self.translate_pdf_with_layout(pdf_data, source_lang, target_lang)
+            progress(layout_stats["pages"], layout_stats["pages"], "pages")
+            return {"pdf": pdf_bytes, "layout": layout_stats}
+        leverage = LeverageStats()
+        translated_text = self.translate_pdf_document(pdf_data, source_lang, target_lang, progress=progress,
+                                                      leverage=leverage)
+        return {"text": translated_text, "pdf": self.pdf_renderer().render(translated_text),
+                "leverage": leverage.as_dict()}
+
+    def pdf_audio_job(self, progress, pdf_data):
+        segments_audio = []
+        with open_pdf(pdf_data) as doc:
+            segments = iter_pdf_chunks(doc, max_chars=self.pdf_audio_segment_chars)
+            for segment_audio in self.read_pdf_to_audio(segments):
+                segments_audio.append(segment_audio)
+                progress(len(segments_audio), unit="segments")
+        return {"audio": join_audio(segments_audio)}
+
+    def caption_job(self, progress, images, backend):
+        progress(0, len(images), "images")
+        captions = self.generate_captions([data for _, data in images], backend)
+        progress(len(images), len(images), "images")
+        return {"captions": [(name, caption) for (name, _), caption in zip(images, captions)]}
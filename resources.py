@@ -0,0 +1,68 @@
+import importlib
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+
+# Mesures de démarrage : imports coûteux, construction des ressources, durée des reruns
+PROCESS_STARTED_AT = time.perf_counter()
+_timings = {}
+_reruns = deque(maxlen=200)
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[name] = _timings.get(name, 0.0) + time.perf_counter() - start
+
+
+# Import différé et chronométré : seul le premier appel paie le coût de l'import
+def lazy_import(module_name):
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with timed(f"import {module_name}"):
+        return importlib.import_module(module_name)
+
+
+# Clients construits une seule fois par processus (Streamlit ré-exécute App.py à chaque interaction)
+# Les reprises sont gérées par groq_client.GroqGateway : celles des SDK sont désactivées
+@lru_cache(maxsize=None)
+def get_llm(model_name="llama3-8b-8192"):
+    from groq_client import get_http_client
+    ChatGroq = lazy_import("langchain_groq").ChatGroq
+    with timed(f"ChatGroq({model_name})"):
+        return ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY"), model_name=model_name,
+                        max_retries=0, http_client=get_http_client())
+
+
+@lru_cache(maxsize=None)
+def get_groq_client():
+    from groq_client import get_http_client
+    Groq = lazy_import("groq").Groq
+    with timed("Groq()"):
+        return Groq(max_retries=0, http_client=get_http_client())
+
+
+def record_rerun(seconds):
+    _reruns.append(seconds)
+
+
+def startup_report():
+    reruns = sorted(_reruns)
+    report = {
+        "process_uptime_s": round(time.perf_counter() - PROCESS_STARTED_AT, 3),
+        "timings_s": {name: round(value, 4) for name, value in sorted(_timings.items(), key=lambda x: -x[1])},
+        "reruns": len(reruns),
+    }
+    if reruns:
+        report["rerun_last_ms"] = round(_reruns[-1] * 1000, 1)
+        report["rerun_p50_ms"] = round(reruns[len(reruns) // 2] * 1000, 1)
+        report["rerun_max_ms"] = round(reruns[-1] * 1000, 1)
+    return report
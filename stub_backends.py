@@ -0,0 +1,159 @@
+import io
+import json
+import re
+import time
+import wave
+from types import SimpleNamespace
+
+
+# Moteurs factices et déterministes pour les bancs d'essai et les traitements hors ligne :
+# même interface que les vrais (GoogleTranslator, ChatGroq, pyttsx3, BLIP), latence réglable
+def _fake_translation(text, target_lang):
+    return f"[{target_lang}] {text}"
+
+
+class StubTranslator:
+    # Comme GoogleTranslator : une paire de langues par instance, .translate(texte)
+    def __init__(self, source_lang="auto", target_lang="en", latency=0.0, per_char=0.0, sleep=time.sleep):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.latency = latency
+        self.per_char = per_char
+        self._sleep = sleep
+
+    def translate(self, text):
+        delay = self.latency + self.per_char * len(text)
+        if delay:
+            self._sleep(delay)
+        return _fake_translation(text, self.target_lang)
+
+
+def stub_translator_factory(latency=0.0, per_char=0.0):
+    return lambda source, target: StubTranslator(source, target, latency, per_char)
+
+
+class StubBatchLLM:
+    # Répond au prompt de batch_translation.build_batch_prompt avec le JSON attendu
+    def __init__(self, latency=0.0, sleep=time.sleep):
+        self.latency = latency
+        self._sleep = sleep
+
+    def __call__(self, prompt):
+        if self.latency:
+            self._sleep(self.latency)
+        header, texts = prompt.split("Textes :\n", 1)
+        langs = header.split(" : ", 1)[1].split(".\n", 1)[0].split(", ")
+        items = json.loads(texts)
+        return json.dumps({"translations": [
+            {"id": item["id"], **{lang: _fake_translation(item["text"], lang) for lang in langs}}
+            for item in items
+        ]}, ensure_ascii=False)
+
+
+class StubMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubChatModel:
+    # Comme ChatGroq : .invoke(messages) rend un message, .stream(messages) des morceaux ;
+    # les prompts de batch_translation reçoivent le JSON attendu, les autres une traduction factice
+    def __init__(self, latency=0.0, token_latency=0.0, sleep=time.sleep):
+        self.latency = latency
+        self.token_latency = token_latency
+        self._sleep = sleep
+
+    def _reply(self, messages):
+        prompt = messages[-1].content
+        if "Textes :\n" in prompt:
+            return StubBatchLLM(sleep=self._sleep)(prompt)
+        # Prompt de traduction (éventuels exemples en tête) : texte après « : »
+        return _fake_translation(prompt.rsplit("\n\n", 1)[-1].split(" : ", 1)[-1], "stub")
+
+    def invoke(self, messages):
+        if self.latency:
+            self._sleep(self.latency)
+        return StubMessage(self._reply(messages))
+
+    def stream(self, messages):
+        if self.latency:
+            self._sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self._reply(messages)):
+            if self.token_latency:
+                self._sleep(self.token_latency)
+            yield StubMessage(token)
+
+
+class StubVisionClient:
+    # Comme groq.Groq : chat.completions.create(...).choices[0].message.content
+    def __init__(self, latency=0.0, sleep=time.sleep):
+        self.latency = latency
+        self._sleep = sleep
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        if self.latency:
+            self._sleep(self.latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=StubMessage(f"an image described by {model}"))])
+
+
+def silent_wav(seconds, rate=16000):
+    output = io.BytesIO()
+    with wave.open(output, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\x00\x00" * int(seconds * rate))
+    return output.getvalue()
+
+
+class StubTTSEngine:
+    # Comme un moteur pyttsx3 : save_to_file puis runAndWait écrit un WAV silencieux
+    # dont la durée suit la longueur du texte (~15 caractères par seconde)
+    def __init__(self, latency=0.0, per_char=0.0):
+        self.latency = latency
+        self.per_char = per_char
+        self._properties = {"voices": [], "rate": 150, "voice": None}
+        self._pending = []
+
+    def getProperty(self, name):
+        return self._properties.get(name)
+
+    def setProperty(self, name, value):
+        self._properties[name] = value
+
+    def save_to_file(self, text, path):
+        self._pending.append((text, path))
+
+    def runAndWait(self):
+        for text, path in self._pending:
+            time.sleep(self.latency + self.per_char * len(text))
+            with open(path, "wb") as f:
+                f.write(silent_wav(max(0.1, len(text) / 15)))
+        self._pending = []
+
+
+class StubTTSFactory:
+    # Fabrique sérialisable (pickle) pour les processus de SegmentedSynthesizer
+    def __init__(self, latency=0.0, per_char=0.0):
+        self.latency = latency
+        self.per_char = per_char
+
+    def __call__(self):
+        return StubTTSEngine(self.latency, self.per_char)
+
+
+class StubCaptioner:
+    # Comme BlipCaptioner.caption_batch : latence fixe par lot plus un coût par image
+    def __init__(self, batch_latency=0.0, per_image=0.0):
+        self.batch_latency = batch_latency
+        self.per_image = per_image
+
+    def caption_batch(self, images, batch_size=8):
+        captions = []
+        for start in range(0, len(images), batch_size):
+            batch = images[start:start + batch_size]
+            time.sleep(self.batch_latency + self.per_image * len(batch))
+            captions.extend(f"an image of {image.width}x{image.height} pixels" for image in batch)
+        return captions
+
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from audio_cache import AudioSegmentCache, synthesize_incremental
+from stub_backends import StubTTSEngine
+from tts_worker import TTSWorker
+
+
+def engine_with_voices(*voice_ids):
+    def factory():
+        engine = StubTTSEngine()
+        engine.setProperty("voices", [SimpleNamespace(id=voice_id, name=voice_id, languages=["fr-fr"])
+                                      for voice_id in voice_ids])
+        return engine
+    return factory
+
+
+def test_voice_id_is_resolved_on_the_worker():
+    worker = TTSWorker(engine_factory=engine_with_voices("roa/fr"))
+    assert worker.voice_id("Français") == "roa/fr"
+    assert worker.voice_id("fr") == "roa/fr"
+    worker.close()
+
+
+def test_changing_the_installed_voice_misses_the_cache(tmp_path):
+    cache = AudioSegmentCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    text = "Première phrase. Deuxième phrase."
+    for voice_ids, misses in ((("roa/fr",), 2), (("roa/fr",), 2), (("mb-fr1",), 4)):
+        worker = TTSWorker(engine_factory=engine_with_voices(*voice_ids))
+        synthesize_incremental(text, "Français", worker.submit, cache, voice=worker.voice_id("Français"))
+        worker.close()
+        assert cache.stats["misses"] == misses
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from batch_translate import _digest, document_key, load_checkpoint, main
+from pdf_pipeline import iter_pdf_chunks, open_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_CHARS = 300
+
+
+def synthetic_pdf(path, pages=3):
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        for index in range(4):
+            text = f"Page {number} paragraphe {index}. " + "La traduction reprend après un incident. " * 3
+            page.insert_textbox(fitz.Rect(50, 50 + index * 120, 550, 160 + index * 120), text, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def run(inputs, output):
+    return main([inputs, "-o", output, "--backend", "stub", "--workers", "1", "--source", "fr",
+                 "--target", "en", "--max-chars", str(MAX_CHARS), "--font", os.path.join(ROOT, "DejaVuSans.ttf")])
+
+
+def test_truncated_line_is_dropped_and_removed(tmp_path):
+    checkpoint = tmp_path / "doc.jsonl"
+    complete = json.dumps({"index": 0, "hash": "h", "text": "t"}) + "\n"
+    checkpoint.write_text(complete + '{"index": 1, "ha', encoding="utf-8")
+    assert load_checkpoint(str(checkpoint)) == {0: ("h", "t")}
+    assert checkpoint.read_text(encoding="utf-8") == complete
+
+
+def test_stub_backend_resumes_a_crashed_run_then_skips_it(tmp_path, capsys):
+    inputs, output = tmp_path / "pdfs", tmp_path / "out"
+    inputs.mkdir()
+    pdf = inputs / "rapport.pdf"
+    synthetic_pdf(str(pdf))
+    with open_pdf(str(pdf)) as doc:
+        chunks = list(iter_pdf_chunks(doc, max_chars=MAX_CHARS))
+    assert len(chunks) > 3
+
+    # Arrêt brutal simulé : deux morceaux écrits, le troisième coupé en pleine ligne
+    checkpoints = output / ".checkpoints"
+    checkpoints.mkdir(parents=True)
+    key = document_key(str(pdf), "fr", "en", MAX_CHARS, "stub")
+    lines = [json.dumps({"index": i, "hash": _digest(chunks[i]), "text": f"REPRIS {i}"}) + "\n" for i in range(3)]
+    (checkpoints / f"rapport-{key}.jsonl").write_text(lines[0] + lines[1] + lines[2][:20], encoding="utf-8")
+
+    assert run(str(inputs), str(output)) == 0
+    summary = json.loads((output / "summary.json").read_text(encoding="utf-8"))
+    assert summary["done"] == 1 and summary["skipped"] == 0
+    assert summary["chunks_resumed"] == 2
+    assert summary["chunks_translated"] == len(chunks) - 2
+    translated = (output / "rapport.en.txt").read_text(encoding="utf-8").split("\n")
+    assert translated[:2] == ["REPRIS 0", "REPRIS 1"]
+    assert "\n".join(translated[2:]) == "\n".join(f"[en] {chunk}" for chunk in chunks[2:])
+    assert (output / "rapport.en.pdf").read_bytes().startswith(b"%PDF")
+    assert not (checkpoints / f"rapport-{key}.jsonl").exists()
+
+    # Deuxième passage : document déjà terminé, rien n'est retraduit
+    assert run(str(inputs), str(output)) == 0
+    summary = json.loads((output / "summary.json").read_text(encoding="utf-8"))
+    assert summary["skipped"] == 1 and summary["done"] == 0 and summary["chunks_translated"] == 0
+    capsys.readouterr()
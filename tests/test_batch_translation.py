@@ -0,0 +1,57 @@
+import json
+
+from batch_translation import parse_batch_response, translate_batch
+from stub_backends import StubBatchLLM
+
+LANGS = ["Français", "Anglais"]
+
+
+def test_fenced_response_with_surrounding_text():
+    raw = ('Voici la traduction :\n```json\n'
+           '{"translations": [{"id": 0, "Français": "bonjour", "Anglais": "hello"}]}\n```\nBonne journée')
+    assert parse_batch_response(raw, 1, LANGS) == {(0, "Français"): "bonjour", (0, "Anglais"): "hello"}
+
+
+def test_bare_single_item_list():
+    raw = '[{"id": 0, "Français": "bonjour", "Anglais": "hello"}]'
+    assert parse_batch_response(raw, 1, LANGS) == {(0, "Français"): "bonjour", (0, "Anglais"): "hello"}
+
+
+def test_bare_object_for_one_text():
+    assert parse_batch_response('{"id": 0, "français": "bonjour"}', 1, LANGS) == {(0, "Français"): "bonjour"}
+    assert parse_batch_response('{"Anglais": "hello"}', 1, LANGS) == {(0, "Anglais"): "hello"}
+
+
+def test_keyed_variant():
+    raw = json.dumps({"0": {"Anglais": "hello"}, "1": {"Anglais": "world"}})
+    assert parse_batch_response(raw, 2, LANGS) == {(0, "Anglais"): "hello", (1, "Anglais"): "world"}
+
+
+def test_malformed_response_is_empty():
+    assert parse_batch_response('{"translations": [{"id": 0, "Anglais": "hel', 1, LANGS) == {}
+    assert parse_batch_response("Désolé, je ne peux pas.", 1, LANGS) == {}
+    assert parse_batch_response(None, 1, LANGS) == {}
+
+
+def test_partial_response_falls_back_per_missing_item():
+    calls = []
+
+    def invoke(prompt):
+        return '{"translations": [{"id": 0, "Français": "bonjour", "Anglais": "hello"}, {"id": 1, "Anglais": ""}]}'
+
+    def fallback(text, lang, source_lang):
+        calls.append((text, lang))
+        return f"{lang}:{text}"
+
+    results = translate_batch(["salut", "monde"], LANGS, invoke, fallback=fallback)
+    assert results == [{"Français": "bonjour", "Anglais": "hello"},
+                       {"Français": "Français:monde", "Anglais": "Anglais:monde"}]
+    assert calls == [("monde", "Français"), ("monde", "Anglais")]
+
+
+def test_one_text_many_languages_needs_no_fallback():
+    calls = []
+    results = translate_batch(["une photo de chat"], ["Anglais", "Espagnol", "Allemand"], StubBatchLLM(),
+                              fallback=lambda *args: calls.append(args))
+    assert set(results[0]) == {"Anglais", "Espagnol", "Allemand"}
+    assert calls == []
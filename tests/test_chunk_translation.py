@@ -0,0 +1,76 @@
+import random
+import time
+
+import pytest
+
+from chunk_translation import ChunkTranslationEngine
+from stub_backends import StubTranslator
+
+
+def jittery_factory(seed=0):
+    # Latence aléatoire par morceau : les morceaux se terminent dans le désordre
+    rng = random.Random(seed)
+    return lambda source, target: StubTranslator(source, target, latency=1.0,
+                                                 sleep=lambda _: time.sleep(rng.uniform(0, 0.01)))
+
+
+class FlakyTranslator:
+    # Échoue failures fois au total (tous morceaux confondus) puis traduit
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def translate(self, text):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("service indisponible")
+        return f"[en] {text}"
+
+
+def test_chunks_come_back_in_order_despite_random_latency():
+    engine = ChunkTranslationEngine(jittery_factory(), max_workers=8)
+    chunks = [f"morceau {i}" for i in range(40)]
+    try:
+        assert engine.translate_chunks(chunks, "fr", "en") == [f"[en] {chunk}" for chunk in chunks]
+        assert list(engine.translate_stream(iter(chunks), "fr", "en", max_in_flight=4)) == \
+            [f"[en] {chunk}" for chunk in chunks]
+    finally:
+        engine.shutdown()
+
+
+def test_failed_request_is_retried_with_backoff():
+    translator = FlakyTranslator(failures=1)
+    delays = []
+    engine = ChunkTranslationEngine(lambda source, target: translator, max_workers=1, max_retries=3,
+                                    backoff=0.5, sleep=delays.append)
+    try:
+        assert engine.translate_chunks(["bonjour"], "fr", "en") == ["[en] bonjour"]
+    finally:
+        engine.shutdown()
+    assert translator.calls == 2
+    assert len(delays) == 1 and 0.25 <= delays[0] <= 0.5
+
+
+def test_engine_gives_up_after_max_retries():
+    translator = FlakyTranslator(failures=10)
+    delays = []
+    engine = ChunkTranslationEngine(lambda source, target: translator, max_workers=1, max_retries=2,
+                                    backoff=1.0, max_backoff=1.5, sleep=delays.append)
+    try:
+        with pytest.raises(ConnectionError):
+            engine.translate_chunks(["bonjour"], "fr", "en")
+    finally:
+        engine.shutdown()
+    assert translator.calls == 3
+    # Backoff exponentiel borné par max_backoff, avec gigue (50 à 100 % du délai)
+    assert 0.5 <= delays[0] <= 1.0 and 0.75 <= delays[1] <= 1.5
+
+
+def test_blank_chunks_skip_the_translator():
+    translator = FlakyTranslator(failures=0)
+    engine = ChunkTranslationEngine(lambda source, target: translator, max_workers=2)
+    try:
+        assert engine.translate_chunks(["", "  ", "texte"], "fr", "en") == ["", "  ", "[en] texte"]
+    finally:
+        engine.shutdown()
+    assert translator.calls == 1
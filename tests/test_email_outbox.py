@@ -0,0 +1,113 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from email_outbox import EmailOutbox, smtp_connector
+
+
+class FakeSMTP:
+    # Serveur SMTP local minimal : refuse temporairement (451) au premier essai les
+    # messages dont le sujet figure dans refuse_once, accepte tous les autres
+    def __init__(self, refuse_once=()):
+        self.received = []
+        self.refuse_once = set(refuse_once)
+        self.connections = 0
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f"{line}\r\n".encode())
+
+            def handle(self):
+                fake.connections += 1
+                self.reply("220 localhost ESMTP test")
+                data, in_data = [], False
+                for raw in self.rfile:
+                    line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                    if in_data:
+                        if line == ".":
+                            in_data = False
+                            subject = next((l[len("Subject: "):] for l in data if l.startswith("Subject:")), "")
+                            if subject in fake.refuse_once:
+                                fake.refuse_once.discard(subject)
+                                self.reply("451 try again later")
+                            else:
+                                fake.received.append(subject)
+                                self.reply("250 OK")
+                            data = []
+                        else:
+                            data.append(line)
+                        continue
+                    command = line[:4].upper()
+                    if command in ("EHLO", "HELO"):
+                        self.reply("250 localhost")
+                    elif command == "DATA":
+                        in_data = True
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def outbox_factory(tmp_path):
+    created = []
+
+    def make(server):
+        outbox = EmailOutbox(str(tmp_path / "outbox.sqlite3"),
+                             connect=smtp_connector("127.0.0.1", server.port, use_ssl=False),
+                             base_delay=0.05, max_delay=0.1, poll_interval=0.1)
+        created.append((outbox, server))
+        return outbox
+    yield make
+    for outbox, server in created:
+        outbox.close()
+        server.close()
+
+
+def wait_delivered(outbox, ids, timeout=10):
+    deadline = time.monotonic() + timeout
+    while any(outbox.status(i)["status"] in ("queued", "sending") for i in ids):
+        assert time.monotonic() < deadline, outbox.counts()
+        time.sleep(0.02)
+
+
+def test_messages_are_delivered_over_one_connection(outbox_factory):
+    server = FakeSMTP()
+    outbox = outbox_factory(server)
+    ids = [outbox.enqueue("app@example.com", "contact@example.com", f"Message #{i}", f"Corps #{i}")
+           for i in range(10)]
+    wait_delivered(outbox, ids)
+    assert outbox.counts() == {"sent": 10}
+    assert sorted(server.received) == sorted(f"Message #{i}" for i in range(10))
+    assert server.connections == 1
+
+
+def test_temporary_refusal_is_retried(outbox_factory):
+    server = FakeSMTP(refuse_once={"Message #4", "Message #9"})
+    outbox = outbox_factory(server)
+    ids = [outbox.enqueue("app@example.com", "contact@example.com", f"Message #{i}", f"Corps #{i}")
+           for i in range(10)]
+    wait_delivered(outbox, ids)
+    assert outbox.counts() == {"sent": 10}
+    assert outbox.status(ids[4])["attempts"] == 2
+    assert outbox.stats["retries"] == 2
+
+
+def test_missing_recipient_is_rejected_before_queueing(outbox_factory):
+    outbox = outbox_factory(FakeSMTP())
+    with pytest.raises(ValueError):
+        outbox.enqueue("app@example.com", None, "Sujet", "Corps")
+    assert outbox.counts() == {}
@@ -0,0 +1,87 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from groq_client import GroqGateway, RateLimitedError
+
+
+class FakeGroq:
+    # Serveur HTTP local qui accepte per_window requêtes par fenêtre de window secondes
+    # et renvoie 429 + retry-after au-delà, comme Groq saturé
+    def __init__(self, per_window=3, window=0.2):
+        self.per_window = per_window
+        self.window = window
+        self.started = time.monotonic()
+        self.count = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake.lock:
+                    now = time.monotonic()
+                    if now - fake.started >= fake.window:
+                        fake.started, fake.count = now, 0
+                    fake.count += 1
+                    allowed = fake.count <= fake.per_window
+                    fake.throttled += not allowed
+                self.send_response(200 if allowed else 429)
+                if not allowed:
+                    self.send_header("retry-after", str(fake.window))
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def fetch(self):
+        with urllib.request.urlopen(self.url) as response:
+            return response.status
+
+
+@pytest.fixture
+def fake_groq():
+    server = FakeGroq()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+def test_requests_without_gateway_are_throttled(fake_groq):
+    def one(_):
+        try:
+            return fake_groq.fetch()
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(one, range(12)))
+    assert 429 in statuses
+
+
+def test_gateway_retries_429_until_every_request_succeeds(fake_groq):
+    gateway = GroqGateway(rpm=6000, tpm=10**9, max_retries=20, base_delay=0.01)
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(lambda _: gateway.call("fake", fake_groq.fetch), range(12)))
+    assert statuses == [200] * 12
+    report = gateway.report()
+    assert report["throttled"] == fake_groq.throttled
+    assert report["failures"] == 0
+
+
+def test_gateway_gives_up_with_rate_limited_error(fake_groq):
+    fake_groq.per_window = 0
+    gateway = GroqGateway(rpm=6000, tpm=10**9, max_retries=1, base_delay=0.01, sleep=lambda s: None)
+    with pytest.raises(RateLimitedError) as info:
+        gateway.call("fake", fake_groq.fetch)
+    assert info.value.retry_after == fake_groq.window
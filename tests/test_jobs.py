@@ -0,0 +1,72 @@
+import threading
+import time
+
+from jobs import JobManager
+
+
+def wait_finished(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while manager.status(job_id)["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_fetch_returns_result_once():
+    manager = JobManager(max_workers=1)
+    job_id = manager.submit("s", "pdf", lambda progress, x: {"text": x}, "bonjour")
+    wait_finished(manager, job_id)
+    fetched = manager.fetch(job_id)
+    assert fetched["status"] == "done"
+    assert fetched["result"] == {"text": "bonjour"}
+    assert fetched["error"] is None
+    assert manager.fetch(job_id) is None
+    manager.shutdown()
+
+
+def test_failed_job_keeps_its_error_through_fetch():
+    def fail(progress):
+        raise RuntimeError("PDF illisible")
+
+    manager = JobManager(max_workers=1)
+    job_id = manager.submit("s", "pdf", fail)
+    wait_finished(manager, job_id)
+    fetched = manager.fetch(job_id)
+    assert fetched["status"] == "failed"
+    assert fetched["result"] is None
+    assert fetched["error"] == "RuntimeError: PDF illisible"
+    assert manager.list("s") == []
+    manager.shutdown()
+
+
+def test_cancelled_job_can_be_dismissed():
+    release = threading.Event()
+    manager = JobManager(max_workers=1, per_session=1)
+    running = manager.submit("s", "audio", lambda progress: release.wait(5))
+    queued = manager.submit("s", "audio", lambda progress: None)
+    assert manager.cancel(queued)
+    assert [job["status"] for job in manager.list("s")][1] == "cancelled"
+    assert manager.dismiss(queued)
+    assert [job["id"] for job in manager.list("s")] == [running]
+    assert not manager.dismiss(running)
+    release.set()
+    wait_finished(manager, running)
+    manager.shutdown()
+
+
+def test_unfetched_results_outlive_the_ttl_but_cancelled_jobs_expire():
+    release = threading.Event()
+    manager = JobManager(max_workers=1, per_session=1, result_ttl=0)
+    done = manager.submit("s", "pdf", lambda progress: "résultat")
+    wait_finished(manager, done)
+    running = manager.submit("s", "audio", lambda progress: release.wait(5))
+    cancelled = manager.submit("s", "audio", lambda progress: None)
+    assert manager.cancel(cancelled)
+    time.sleep(0.01)
+    # Une nouvelle soumission déclenche la purge
+    manager.submit("s", "audio", lambda progress: None)
+    ids = [job["id"] for job in manager.list("s")]
+    assert done in ids and cancelled not in ids
+    assert manager.fetch(done)["result"] == "résultat"
+    release.set()
+    wait_finished(manager, running)
+    manager.shutdown()
@@ -0,0 +1,67 @@
+from llm_streaming import TokenStream
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeStreamingModel:
+    # Comme un modèle de chat LangChain : .stream() rend des morceaux porteurs de .content,
+    # chaque morceau coûtant delay secondes sur l'horloge factice
+    def __init__(self, tokens, clock, delay=1.0):
+        self.tokens = tokens
+        self.clock = clock
+        self.delay = delay
+
+    def stream(self, messages):
+        for token in self.tokens:
+            self.clock.now += self.delay
+            yield Chunk(token)
+
+
+def test_tokens_are_yielded_in_order_and_assembled():
+    clock = FakeClock()
+    model = FakeStreamingModel(["Bon", "jour", "", " !"], clock)
+    stream = TokenStream(model.stream([]), clock=clock)
+    assert list(stream) == ["Bon", "jour", " !"]
+    assert stream.text == "Bonjour !"
+
+
+def test_first_token_arrives_before_the_end_of_the_stream():
+    clock = FakeClock()
+    model = FakeStreamingModel(["a"] * 10, clock, delay=0.5)
+    stream = TokenStream(model.stream([]), clock=clock)
+    iterator = iter(stream)
+    assert next(iterator) == "a"
+    # Premier token disponible après un seul morceau, sans attendre la réponse complète
+    assert stream.time_to_first_token == 0.5
+    assert stream.total_time is None
+    list(iterator)
+    assert stream.total_time == 5.0
+    assert stream.time_to_first_token < stream.total_time
+
+
+def test_on_complete_receives_the_full_text():
+    clock = FakeClock()
+    received = []
+    stream = TokenStream(FakeStreamingModel(["x", "y", "z"], clock).stream([]),
+                         on_complete=received.append, clock=clock)
+    for _ in stream:
+        assert received == []
+    assert received == ["xyz"]
+
+
+def test_empty_stream_has_no_first_token():
+    stream = TokenStream(iter([]), clock=FakeClock())
+    assert list(stream) == []
+    assert stream.text == ""
+    assert stream.time_to_first_token is None
@@ -0,0 +1,43 @@
+import pytest
+
+from marian_translation import TranslationRouter
+from pipelines import Pipelines
+from stub_backends import stub_translator_factory
+from translation_cache import TranslationCache
+from translation_memory import TranslationMemory
+
+
+@pytest.fixture
+def pipelines():
+    app = Pipelines(translator_factory=stub_translator_factory, router=lambda: TranslationRouter(()),
+                    translation_cache=lambda: TranslationCache(path=None),
+                    translation_memory=lambda: TranslationMemory(None))
+    yield app
+    app.close()
+
+
+def sample_pdf():
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(50, 50, 550, 200), "Bonjour tout le monde. Une seconde phrase.", fontsize=11)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_background_pdf_job_honours_keep_layout(pipelines):
+    reports = []
+    result = pipelines.pdf_translation_job(lambda *args, **kwargs: reports.append(args), sample_pdf(),
+                                           "fr", "en", keep_layout=True)
+    assert result["pdf"].startswith(b"%PDF")
+    assert result["layout"]["pages"] == 1
+    assert "text" not in result
+    assert reports == [(1, 1, "pages")]
+
+
+def test_background_pdf_job_without_layout_returns_text(pipelines):
+    result = pipelines.pdf_translation_job(lambda *args, **kwargs: None, sample_pdf(), "fr", "en")
+    assert "Bonjour tout le monde." in result["text"]
+    assert result["pdf"].startswith(b"%PDF")
+    assert result["leverage"]["segments"] == 2
@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules du chemin de démarrage de App.py : leur import ne doit charger aucune
+# bibliothèque lourde (elles passent par lazy_import au premier usage)
+STARTUP_MODULES = ["translation_cache", "chunk_translation", "pdf_pipeline", "llm_streaming",
+                   "chat_history", "batch_translation", "image_preprocess", "tts_worker", "pdf_audio",
+                   "metrics", "tracing", "assets", "audio_cache", "local_captioning", "marian_translation",
+                   "pdf_renderer", "pdf_layout_translation", "jobs", "groq_client", "translation_memory",
+                   "email_outbox", "pipelines"]
+HEAVY_MODULES = ["torch", "transformers", "fitz", "fpdf", "pyttsx3", "deep_translator",
+                 "groq", "langchain_groq", "langsmith"]
+
+# Import à froid dans un interpréteur neuf, chronométré par resources.lazy_import
+SCRIPT = """
+import json, sys, time
+import resources
+start = time.perf_counter()
+for name in sys.argv[1].split(","):
+    resources.lazy_import(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({"cold_import_s": elapsed,
+                  "heavy": [m for m in sys.argv[2].split(",") if m in sys.modules]}))
+"""
+
+
+def test_cold_import_stays_light_and_within_budget():
+    # chat_history importe langchain_core (dépendance de l'application) dès le démarrage
+    pytest.importorskip("langchain_core")
+    budget = float(os.getenv("STARTUP_BUDGET_SECONDS", "2"))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT, ",".join(STARTUP_MODULES), ",".join(HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    report = json.loads(output)
+    assert report["heavy"] == []
+    assert report["cold_import_s"] <= budget
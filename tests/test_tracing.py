@@ -0,0 +1,72 @@
+import sys
+from types import SimpleNamespace
+
+from tracing import Tracer, langsmith_sender, traced
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+def test_nested_spans_share_the_trace_and_extend_the_dotted_order():
+    exporter = RecordingExporter()
+    tracer = Tracer(exporter, default_rate=1.0)
+
+    @traced("Inner", tracer=tracer)
+    def inner(text):
+        return text.upper()
+
+    @traced("Outer", tracer=tracer)
+    def outer(text):
+        return inner(text)
+
+    assert outer("bonjour") == "BONJOUR"
+    child, parent = exporter.spans
+    assert child.parent_id == parent.id
+    assert child.trace_id == parent.trace_id == parent.id
+    assert child.dotted_order.startswith(parent.dotted_order + ".")
+    assert child.dotted_order.endswith(child.id)
+
+
+def test_unsampled_parent_suppresses_nested_spans():
+    exporter = RecordingExporter()
+    tracer = Tracer(exporter, default_rate=1.0, rates={"Outer": 0.0})
+
+    @traced("Inner", tracer=tracer)
+    def inner(text):
+        return text.upper()
+
+    @traced("Inner", tracer=tracer)
+    def inner_stream(text):
+        yield inner(text)
+
+    @traced("Outer", tracer=tracer)
+    def outer(text):
+        return inner(text) + "".join(inner_stream(text))
+
+    assert outer("a") == "AA"
+    assert exporter.spans == []
+    # Hors de l'appel non échantillonné, le contexte est rétabli
+    assert inner("b") == "B"
+    assert [span.name for span in exporter.spans] == ["Inner"]
+    assert exporter.spans[0].parent_id is None
+
+def test_langsmith_sender_ingests_each_batch_in_one_call(monkeypatch):
+    calls = []
+
+    class Client:
+        def __init__(self, api_key, api_url):
+            pass
+
+        def batch_ingest_runs(self, create=None, update=None):
+            calls.append(create)
+
+    monkeypatch.setitem(sys.modules, "langsmith", SimpleNamespace(Client=Client))
+    send = langsmith_sender("clé", "https://example.invalid", "LanguePro AI")
+    send([{"id": "1", "trace_id": "1", "dotted_order": "a"}, {"id": "2", "trace_id": "1", "dotted_order": "a.b"}])
+    assert len(calls) == 1
+    assert [run["session_name"] for run in calls[0]] == ["LanguePro AI", "LanguePro AI"]
@@ -0,0 +1,23 @@
+from translation_cache import TranslationCache, make_cache_key
+
+
+def test_overwrites_do_not_inflate_the_disk_count(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"), max_memory_items=2, max_disk_items=10)
+    key = make_cache_key("google", "deep_translator", "fr", "en", "bonjour")
+    for value in ("hello", "hi", "hello"):
+        cache.set(key, value)
+    cache.set(make_cache_key("google", "deep_translator", "fr", "en", "merci"), "thanks")
+    assert cache.stats()["disk_items"] == 2
+    reopened = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    assert reopened.stats()["disk_items"] == 2
+    assert reopened.get(key) == "hello"
+
+
+def test_disk_eviction_keeps_the_limit(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"), max_memory_items=1, max_disk_items=3)
+    for i in range(5):
+        cache.set(f"k{i}", f"v{i}")
+        cache.set(f"k{i}", f"v{i}!")
+    assert cache.stats()["disk_items"] == 3
+    assert cache.get("k0") is None
+    assert cache.get("k4") == "v4!"
@@ -0,0 +1,67 @@
+from metrics import REGISTRY
+from translation_memory import LeverageStats, TranslationMemory, translate_with_memory
+
+
+def mismatches():
+    return sum(counter["value"] for counter in REGISTRY.snapshot()["counters"]
+               if counter["name"] == "translation_memory_mismatches_total")
+
+
+class LineTranslator:
+    # Traduit ligne à ligne ; drop : lignes source rendues vides (comme « 1. » chez Google)
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return "\n".join("" if line in self.drop else f"EN {line}" for line in text.split("\n"))
+
+
+def test_aligned_response_is_split_and_remembered():
+    memory = TranslationMemory(None)
+    translate = LineTranslator()
+    leverage = LeverageStats()
+    text = "Première phrase.\nDeuxième phrase."
+    assert translate_with_memory(text, "fr", "en", translate, memory, leverage=leverage) == \
+        "EN Première phrase.\nEN Deuxième phrase."
+    assert memory.lookup("fr", "en", "Deuxième phrase.").translation == "EN Deuxième phrase."
+    # Révision : seule la phrase nouvelle repart au traducteur
+    translate_with_memory("Première phrase.\nTroisième phrase.", "fr", "en", translate, memory, leverage=leverage)
+    assert translate.calls[-1] == "Troisième phrase."
+    assert leverage.as_dict()["exact_matches"] == 1
+
+
+def test_line_count_mismatch_translates_the_chunk_once_without_remembering():
+    memory = TranslationMemory(None)
+    memory.add("fr", "en", "Déjà traduite.", "EN connue")
+    translate = LineTranslator(drop={"1."})
+    leverage = LeverageStats()
+    before = mismatches()
+    text = "Déjà traduite.\n1.\nPhrase une.\nPhrase deux."
+    result = translate_with_memory(text, "fr", "en", translate, memory, leverage=leverage)
+    assert result == "EN Déjà traduite.\n\nEN Phrase une.\nEN Phrase deux."
+    assert translate.calls == ["1.\nPhrase une.\nPhrase deux.", text]
+    assert mismatches() == before + 1
+    assert memory.lookup("fr", "en", "Phrase une.") is None
+    assert leverage.as_dict()["translated"] == 4
+
+
+def test_mismatch_without_reuse_keeps_the_first_response():
+    memory = TranslationMemory(None)
+    translate = LineTranslator(drop={"1."})
+    result = translate_with_memory("1.\nPhrase une.", "fr", "en", translate, memory)
+    assert result == "\nEN Phrase une."
+    assert len(translate.calls) == 1
+
+
+def test_misaligned_lengths_are_not_remembered():
+    memory = TranslationMemory(None)
+
+    def shifted(text):
+        # Même nombre de lignes, mais contenus décalés d'une phrase à l'autre
+        return "Un très long paragraphe qui correspond en réalité aux deux phrases suivantes réunies.\nOk"
+
+    translate_with_memory("Court.\nUne phrase bien plus longue que la première, vraiment.", "fr", "en",
+                          shifted, memory)
+    assert memory.lookup("fr", "en", "Court.") is None
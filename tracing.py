@@ -0,0 +1,280 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from metrics import inc
+from resources import lazy_import
+
+
+# Span parent de l'appel en cours (les appels imbriqués suivent la décision du parent) ;
+# _NOT_SAMPLED pendant un appel racine non échantillonné
+_current_span = contextvars.ContextVar("current_span", default=None)
+_NOT_SAMPLED = object()
+
+
+def _summarize(value, limit=500):
+    # Entrées/sorties tronquées : pas d'octets (PDF, audio, images) dans les traces
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} octets>"
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + f"… ({len(value)} caractères)"
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_summarize(item, limit // 4 or 1) for item in value[:10]] + (["…"] if len(value) > 10 else [])
+    if isinstance(value, dict):
+        return {str(key): _summarize(item, limit // 4 or 1) for key, item in list(value.items())[:20]}
+    content = getattr(value, "content", None)
+    if isinstance(content, str):
+        return {"type": type(value).__name__, "content": _summarize(content, limit)}
+    return f"<{type(value).__name__}>"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Span:
+    __slots__ = ("id", "parent_id", "trace_id", "dotted_order", "name", "inputs", "outputs", "error",
+                 "start_time", "end_time")
+
+    def __init__(self, name, inputs, parent=None):
+        self.id = str(uuid.uuid4())
+        self.parent_id = parent.id if parent else None
+        self.name = name
+        self.inputs = inputs
+        self.outputs = None
+        self.error = None
+        self.start_time = _now()
+        self.end_time = None
+        # Ordre pointé (date + id de chaque ancêtre) : LangSmith rattache les spans d'un
+        # même lot à leur trace sans attendre leurs parents
+        order = f"{self.start_time:%Y%m%dT%H%M%S%fZ}{self.id}"
+        self.trace_id = parent.trace_id if parent else self.id
+        self.dotted_order = f"{parent.dotted_order}.{order}" if parent else order
+
+    def as_run(self):
+        return {
+            "id": self.id, "parent_run_id": self.parent_id, "trace_id": self.trace_id,
+            "dotted_order": self.dotted_order, "name": self.name, "run_type": "chain",
+            "inputs": self.inputs, "outputs": self.outputs, "error": self.error,
+            "start_time": self.start_time, "end_time": self.end_time,
+        }
+
+
+class BatchSpanExporter:
+    # File bornée vidée par un thread de fond, par lots : export() ne bloque jamais,
+    # un span est abandonné (et compté) quand la file est pleine
+    def __init__(self, send, max_queue=1000, batch_size=50, flush_interval=2.0):
+        self.send = send
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"queued": 0, "dropped": 0, "exported": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            inc("traces_total", result="dropped")
+            return
+        self.stats["queued"] += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.send([span.as_run() for span in batch])
+                self.stats["exported"] += len(batch)
+                inc("traces_total", len(batch), result="exported")
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                inc("traces_total", len(batch), result="failed")
+                print(f"Export des traces impossible : {e}")
+
+    def flush(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+def langsmith_sender(api_key, api_url, project):
+    client = lazy_import("langsmith").Client(api_key=api_key, api_url=api_url)
+
+    # Un appel HTTP par lot de spans (et non un create_run par span)
+    def send(runs):
+        client.batch_ingest_runs(create=[{**run, "session_name": project} for run in runs])
+    return send
+
+
+def jsonl_sender(path):
+    lock = threading.Lock()
+
+    def send(runs):
+        with lock, open(path, "a", encoding="utf-8") as f:
+            for run in runs:
+                f.write(json.dumps(run, default=str, ensure_ascii=False) + "\n")
+    return send
+
+
+class Tracer:
+    # Échantillonnage par fonction ("TextToAudio=0,TranslationChain=0.2"), taux par défaut
+    # pour les autres ; sans exportateur, le traceur est inactif (taux nul partout)
+    def __init__(self, exporter=None, default_rate=1.0, rates=None):
+        self.exporter = exporter
+        self.default_rate = default_rate if exporter is not None else 0.0
+        self.rates = rates or {}
+
+    def rate(self, name):
+        if self.exporter is None:
+            return 0.0
+        return self.rates.get(name, self.default_rate)
+
+    def should_sample(self, name):
+        rate = self.rate(name)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    def finish(self, span):
+        span.end_time = _now()
+        inc("traces_total", result="sampled")
+        self.exporter.export(span)
+
+
+def parse_rates(value):
+    rates = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+# Configuration depuis l'environnement : LangSmith si LANGCHAIN_API_KEY est défini,
+# fichier JSONL si TRACE_FILE l'est, sinon aucun export
+@lru_cache(maxsize=None)
+def get_tracer():
+    default_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    rates = parse_rates(os.getenv("TRACE_SAMPLE_RATES", ""))
+    api_key = os.getenv("LANGCHAIN_API_KEY")
+    trace_file = os.getenv("TRACE_FILE")
+    if api_key:
+        send = langsmith_sender(
+            api_key,
+            os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com"),
+            os.getenv("LANGCHAIN_PROJECT", "LanguePro AI"),
+        )
+    elif trace_file:
+        send = jsonl_sender(trace_file)
+    else:
+        return Tracer()
+    exporter = BatchSpanExporter(
+        send,
+        max_queue=int(os.getenv("TRACE_QUEUE_SIZE", "1000")),
+        batch_size=int(os.getenv("TRACE_BATCH_SIZE", "50")),
+    )
+    return Tracer(exporter, default_rate=default_rate, rates=rates)
+
+
+def _inputs(signature, args, kwargs):
+    try:
+        bound = signature.bind_partial(*args, **kwargs)
+    except TypeError:
+        return {"args": _summarize(list(args)), "kwargs": _summarize(kwargs)}
+    # self : l'instance (Pipelines, moteur) n'est pas une entrée du span
+    return {name: _summarize(value) for name, value in bound.arguments.items() if name != "self"}
+
+
+# Remplace @traceable : un appel non échantillonné coûte un test de taux et un marqueur
+# de contexte (pour que ses appels imbriqués ne soient pas tracés), sans span
+def traced(name=None, tracer=None):
+    def decorator(fn):
+        span_name = name or fn.__name__
+        signature = inspect.signature(fn)
+        get = (lambda: tracer) if tracer is not None else get_tracer
+
+        # token None : le contexte est laissé tel quel (appel dans un parent non échantillonné)
+        def start(args, kwargs):
+            parent = _current_span.get()
+            if parent is _NOT_SAMPLED:
+                return None, None, None
+            current = get()
+            if parent is None and not current.should_sample(span_name):
+                return None, None, _current_span.set(_NOT_SAMPLED)
+            span = Span(span_name, _inputs(signature, args, kwargs), parent)
+            return current, span, _current_span.set(span)
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                current, span, token = start(args, kwargs)
+                if token is None:
+                    yield from fn(*args, **kwargs)
+                    return
+                marker = span if span is not None else _NOT_SAMPLED
+                items = 0
+                try:
+                    # Le contexte est rétabli à chaque reprise : le générateur peut être
+                    # consommé depuis un autre contexte que celui de sa création
+                    _current_span.reset(token)
+                    iterator = fn(*args, **kwargs)
+                    while True:
+                        token = _current_span.set(marker)
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current_span.reset(token)
+                        items += 1
+                        yield item
+                    if span is not None:
+                        span.outputs = {"items": items}
+                except BaseException as e:
+                    if span is not None:
+                        span.error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    if span is not None:
+                        current.finish(span)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            current, span, token = start(args, kwargs)
+            if token is None:
+                return fn(*args, **kwargs)
+            if span is None:
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    _current_span.reset(token)
+            try:
+                result = fn(*args, **kwargs)
+                span.outputs = {"output": _summarize(result)}
+                return result
+            except BaseException as e:
+                span.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _current_span.reset(token)
+                current.finish(span)
+        return wrapper
+    return decorator
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from metrics import inc
+
+
+# Normalisation du texte avant hachage : mêmes espaces, même forme Unicode
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+# Clé de cache : backend + modèle + paire de langues + empreinte du texte normalisé
+def make_cache_key(backend, model, source_lang, target_lang, text):
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return "|".join([backend, model or "", source_lang or "auto", target_lang or "", digest])
+
+
+class TranslationCache:
+    # Cache à deux niveaux : LRU en mémoire devant un stockage SQLite sur disque
+    def __init__(self, path="translation_cache.sqlite3", max_memory_items=1024,
+                 max_disk_items=100_000, ttl=None):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations(accessed_at)"
+            )
+            self._conn.commit()
+            self._disk_count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    inc("cache_lookups_total", cache="translation", result="memory_hit")
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM translations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at, now):
+                        self._conn.execute(
+                            "UPDATE translations SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._conn.commit()
+                        self._remember(key, value, created_at)
+                        self._stats["disk_hits"] += 1
+                        inc("cache_lookups_total", cache="translation", result="disk_hit")
+                        return value
+                    self._conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._disk_count -= 1
+
+            self._stats["misses"] += 1
+            inc("cache_lookups_total", cache="translation", result="miss")
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is None:
+                return
+            # Sous le même verrou : seule une vraie insertion (clé absente) augmente le compte
+            exists = self._conn.execute("SELECT 1 FROM translations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)", (key, value, now, now)
+            )
+            if exists is None:
+                self._disk_count += 1
+            if self._disk_count > self.max_disk_items:
+                self._disk_count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                overflow = self._disk_count - self.max_disk_items
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM translations WHERE key IN ("
+                        "SELECT key FROM translations ORDER BY accessed_at LIMIT ?)", (overflow,)
+                    )
+                    self._disk_count -= overflow
+                    self._stats["evictions"] += overflow
+            self._conn.commit()
+
+    def get_or_compute(self, backend, model, source_lang, target_lang, text, compute):
+        key = make_cache_key(backend, model, source_lang, target_lang, text)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_items"] = self._disk_count if self._conn is not None else 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM translations")
+                self._conn.commit()
+                self._disk_count = 0
+
+
+# Construction depuis les variables d'environnement (.env)
+def cache_from_env():
+    ttl = os.getenv("TRANSLATION_CACHE_TTL")
+    return TranslationCache(
+        path=os.getenv("TRANSLATION_CACHE_PATH", "translation_cache.sqlite3"),
+        max_memory_items=int(os.getenv("TRANSLATION_CACHE_MEMORY_ITEMS", "1024")),
+        max_disk_items=int(os.getenv("TRANSLATION_CACHE_DISK_ITEMS", "100000")),
+        ttl=float(ttl) if ttl else None,
+    )
@@ -0,0 +1,295 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from languages import language_code
+from metrics import inc
+from pdf_pipeline import SENTENCE_END
+from translation_cache import normalize_text
+
+
+# Mémoire de traduction : paires (segment source, traduction) par paire de langues, retrouvées
+# à l'identique (empreinte) ou par similarité (MinHash sur trigrammes de caractères, index LSH
+# par bandes stocké dans SQLite : la recherche reste une poignée de lectures indexées)
+
+
+def _shingles(text, n):
+    text = normalize_text(text).casefold()
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _digest(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class TMMatch:
+    __slots__ = ("source", "translation", "similarity")
+
+    def __init__(self, source, translation, similarity):
+        self.source = source
+        self.translation = translation
+        self.similarity = similarity
+
+    def __repr__(self):
+        return f"TMMatch({self.similarity:.2f}, {self.source[:40]!r})"
+
+
+class TranslationMemory:
+    def __init__(self, path="translation_memory.sqlite3", threshold=0.8, ngram=3, bands=8, rows=4,
+                 max_candidates=32, max_bucket=64):
+        self.path = path
+        self.threshold = threshold
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = rows
+        self.max_candidates = max_candidates
+        self.max_bucket = max_bucket
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "id INTEGER PRIMARY KEY, pair TEXT NOT NULL, digest TEXT NOT NULL, "
+            "source TEXT NOT NULL, translation TEXT NOT NULL, created_at REAL NOT NULL, "
+            "UNIQUE(pair, digest))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lsh (bucket INTEGER NOT NULL, segment INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh(bucket)")
+        self._conn.commit()
+
+    # Une mémoire par moteur et par modèle (comme la clé du cache de traductions) ; langues
+    # ramenées à leur code : "Français" (page Traduction) et "fr" (PDF) désignent la même paire
+    @staticmethod
+    def _pair(source_lang, target_lang, backend=None, model=None):
+        return f"{backend or ''}|{model or ''}|{language_code(source_lang) or 'auto'}>{language_code(target_lang)}"
+
+    # MinHash « à une permutation » densifié : un seul hachage (crc32, stable d'un processus
+    # à l'autre) par trigramme, réparti entre k cases dont on garde le minimum ; une case vide
+    # reprend la valeur de la suivante non vide (Shrivastava et Li, 2014)
+    def _signature(self, shingles):
+        k = self.bands * self.rows
+        bins = [None] * k
+        for shingle in shingles:
+            h = zlib.crc32(shingle.encode("utf-8"))
+            index, value = h % k, h // k
+            if bins[index] is None or value < bins[index]:
+                bins[index] = value
+        if None in bins:
+            filled = [i for i, value in enumerate(bins) if value is not None]
+            for i in range(k):
+                if bins[i] is None:
+                    donor = next((j for j in filled if j > i), filled[0])
+                    bins[i] = bins[donor] + (donor - i) % k * (1 << 32)
+        return bins
+
+    def _buckets(self, pair, shingles):
+        signature = self._signature(shingles)
+        salt = zlib.crc32(pair.encode("utf-8"))
+        rows = self.rows
+        # hash() d'un tuple d'entiers est stable d'un processus à l'autre (pas de sel)
+        return [hash((band, salt, *signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def _insert(self, pair, source, translation, now, lsh_rows):
+        digest = _digest(source)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO segments (pair, digest, source, translation, created_at) VALUES (?, ?, ?, ?, ?)",
+            (pair, digest, source, translation, now),
+        )
+        if cursor.rowcount:
+            segment_id = cursor.lastrowid
+            lsh_rows.extend((bucket, segment_id) for bucket in self._buckets(pair, _shingles(source, self.ngram)))
+        else:
+            # Segment déjà connu : la traduction la plus récente l'emporte
+            self._conn.execute("UPDATE segments SET translation = ?, created_at = ? WHERE pair = ? AND digest = ?",
+                               (translation, now, pair, digest))
+
+    def add(self, source_lang, target_lang, source, translation, backend=None, model=None):
+        self.add_many(source_lang, target_lang, [(source, translation)], backend, model)
+
+    def add_many(self, source_lang, target_lang, pairs, backend=None, model=None):
+        pair = self._pair(source_lang, target_lang, backend, model)
+        now = time.time()
+        lsh_rows = []
+        with self._lock:
+            for source, translation in pairs:
+                if normalize_text(source) and translation:
+                    self._insert(pair, source, translation, now, lsh_rows)
+            self._conn.executemany("INSERT INTO lsh (bucket, segment) VALUES (?, ?)", lsh_rows)
+            self._conn.commit()
+
+    # Meilleure correspondance au-dessus du seuil (similarité de Jaccard sur les trigrammes)
+    def lookup(self, source_lang, target_lang, text, threshold=None, backend=None, model=None):
+        matches = self.similar(source_lang, target_lang, text, limit=1, threshold=threshold,
+                               backend=backend, model=model)
+        return matches[0] if matches else None
+
+    def similar(self, source_lang, target_lang, text, limit=3, threshold=None, backend=None, model=None):
+        threshold = self.threshold if threshold is None else threshold
+        pair = self._pair(source_lang, target_lang, backend, model)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, translation FROM segments WHERE pair = ? AND digest = ?", (pair, _digest(text))
+            ).fetchone()
+        if row is not None:
+            inc("tm_lookups_total", result="exact")
+            return [TMMatch(row[0], row[1], 1.0)]
+        if threshold >= 1.0:
+            inc("tm_lookups_total", result="miss")
+            return []
+
+        shingles = _shingles(text, self.ngram)
+        buckets = self._buckets(pair, shingles)
+        hits = {}
+        with self._lock:
+            # Seaux lus au plus max_bucket entrées : un seau surpeuplé (texte très répétitif)
+            # ne doit pas faire exploser le temps de recherche
+            for bucket in buckets:
+                for (segment_id,) in self._conn.execute(
+                        "SELECT segment FROM lsh WHERE bucket = ? LIMIT ?", (bucket, self.max_bucket)):
+                    hits[segment_id] = hits.get(segment_id, 0) + 1
+            # Candidats classés par nombre de bandes communes
+            best = sorted(hits, key=hits.get, reverse=True)[:self.max_candidates]
+            candidates = self._conn.execute(
+                f"SELECT source, translation FROM segments WHERE id IN ({','.join('?' * len(best))})", best
+            ).fetchall() if best else []
+        scored = [TMMatch(source, translation, jaccard(shingles, _shingles(source, self.ngram)))
+                  for source, translation in candidates]
+        scored = sorted((m for m in scored if m.similarity >= threshold), key=lambda m: -m.similarity)[:limit]
+        inc("tm_lookups_total", result="fuzzy" if scored else "miss")
+        return scored
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT pair, COUNT(*) FROM segments GROUP BY pair").fetchall()
+        return {"segments": sum(count for _, count in rows), "pairs": dict(rows)}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM lsh")
+            self._conn.execute("DELETE FROM segments")
+            self._conn.commit()
+
+
+class LeverageStats:
+    # Part du document couverte par la mémoire : segments repris à l'identique, repris par
+    # similarité (au-dessus du seuil de reprise) ou traduits
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.segments = 0
+        self.exact = 0
+        self.fuzzy = 0
+        self.translated = 0
+        self.chars = 0
+        self.translated_chars = 0
+
+    def record(self, kind, chars):
+        with self._lock:
+            self.segments += 1
+            self.chars += chars
+            setattr(self, kind, getattr(self, kind) + 1)
+            if kind == "translated":
+                self.translated_chars += chars
+
+    # Morceau servi tel quel par le cache de traductions : toutes ses phrases sont reprises
+    def record_cached(self, text):
+        for segment in split_segments(text)[0]:
+            self.record("exact", len(segment))
+
+    def as_dict(self):
+        with self._lock:
+            reused = self.exact + self.fuzzy
+            return {
+                "segments": self.segments,
+                "exact_matches": self.exact,
+                "fuzzy_matches": self.fuzzy,
+                "translated": self.translated,
+                "leverage": round(reused / self.segments, 3) if self.segments else 0.0,
+                "chars_saved": round(1 - self.translated_chars / self.chars, 3) if self.chars else 0.0,
+            }
+
+
+def split_segments(text):
+    # Phrases par ligne ; layout garde le nombre de phrases de chaque ligne pour le réassemblage
+    segments, layout = [], []
+    for line in text.split("\n"):
+        parts = [p for p in SENTENCE_END.split(line.strip()) if p] if line.strip() else []
+        layout.append(len(parts))
+        segments.extend(parts)
+    return segments, layout
+
+
+def join_segments(translations, layout):
+    translated = iter(translations)
+    return "\n".join(" ".join(next(translated) for _ in range(count)) for count in layout)
+
+
+# Traduit un texte phrase par phrase en reprenant ce que la mémoire connaît déjà ; les phrases
+# restantes partent en une seule requête (une par ligne), sinon une à une si le moteur ne
+# rend pas le même nombre de lignes
+# Lignes traduites plausiblement alignées sur les phrases source (longueurs comparables) :
+# sinon une ligne décalée serait enregistrée en face de la mauvaise phrase
+def _aligned(sources, lines, ratio=4, slack=20):
+    return len(sources) == len(lines) and all(
+        len(line) <= ratio * len(source) + slack and len(source) <= ratio * len(line) + slack
+        for source, line in zip(sources, lines)
+    )
+
+
+def translate_with_memory(text, source_lang, target_lang, translate, memory, reuse_threshold=1.0, leverage=None,
+                          backend=None, model=None):
+    segments, layout = split_segments(text)
+    results = [None] * len(segments)
+    missing = []
+    reused = []
+    for index, segment in enumerate(segments):
+        match = memory.lookup(source_lang, target_lang, segment, threshold=reuse_threshold,
+                              backend=backend, model=model)
+        if match is None:
+            missing.append(index)
+            continue
+        results[index] = match.translation
+        reused.append(("exact" if match.similarity >= 1.0 else "fuzzy", index))
+
+    if missing:
+        sources = [segments[i] for i in missing]
+        joined = translate("\n".join(sources))
+        lines = [line.strip() for line in (joined or "").split("\n") if line.strip()]
+        if not _aligned(sources, lines):
+            # Réponse non alignée phrase à phrase : le morceau entier est traduit en une
+            # requête, sans rien enregistrer dans la mémoire
+            inc("translation_memory_mismatches_total", backend=backend or "unknown")
+            if leverage is not None:
+                for segment in segments:
+                    leverage.record("translated", len(segment))
+            # Rien repris et même texte : la réponse déjà reçue est celle du morceau entier
+            if not reused and "\n".join(sources) == text:
+                return joined or ""
+            return translate(text)
+        for index, line in zip(missing, lines):
+            results[index] = line
+        memory.add_many(source_lang, target_lang, list(zip(sources, lines)), backend, model)
+    if leverage is not None:
+        for kind, index in reused:
+            leverage.record(kind, len(segments[index]))
+        for index in missing:
+            leverage.record("translated", len(segments[index]))
+    return join_segments(results, layout)
+
+
+def memory_from_env():
+    return TranslationMemory(
+        path=os.getenv("TRANSLATION_MEMORY_PATH", "translation_memory.sqlite3"),
+        threshold=float(os.getenv("TRANSLATION_MEMORY_HINT_THRESHOLD", "0.6")),
+    )
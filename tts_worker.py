@@ -0,0 +1,136 @@
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import Future
+
+from languages import language_code
+from metrics import byte_size, inc, stage
+
+
+VOICE_NAMES = {
+    "fr": "french",
+    "en": "english",
+    "es": "spanish",
+    "de": "german",
+    "ar": "arabic",
+    "zh": "chinese",
+    "pt": "portuguese",
+    "it": "italian",
+}
+
+
+def _voice_languages(voice):
+    # espeak renvoie des octets préfixés (b"\x05fr"), sapi5/nsss des chaînes "fr_FR"
+    languages = []
+    for value in getattr(voice, "languages", None) or []:
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", errors="ignore").lstrip("\x00\x01\x02\x03\x04\x05\x06")
+        languages.append(value.replace("_", "-").lower())
+    return languages
+
+
+def find_voice(voices, lang):
+    if not voices:
+        return None
+    code = language_code(lang)
+    if code:
+        for voice in voices:
+            if any(l == code or l.startswith(code + "-") for l in _voice_languages(voice)):
+                return voice
+        # Sinon : identifiant espeak ("roa/fr") ou nom anglais ("... - French")
+        name = VOICE_NAMES.get(code, code)
+        for voice in voices:
+            identifier = str(voice.id).lower().replace("\\", "/")
+            if identifier.rsplit("/", 1)[-1] == code or name in str(getattr(voice, "name", "")).lower():
+                return voice
+    return voices[0]
+
+
+def _default_engine_factory():
+    import pyttsx3
+    return pyttsx3.init()
+
+
+class TTSWorker:
+    # Thread dédié qui garde le moteur pyttsx3 initialisé et traite les demandes en file ;
+    # chaque demande écrit dans un fichier temporaire unique, lu puis supprimé
+    def __init__(self, rate=150, engine_factory=_default_engine_factory, suffix=".wav"):
+        self.rate = rate
+        self.engine_factory = engine_factory
+        self.suffix = suffix
+        self._jobs = queue.Queue()
+        self._voices = {}
+        self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, text, lang=None, rate=None):
+        future = Future()
+        self._jobs.put((text, lang, rate or self.rate, future))
+        return future
+
+    def synthesize(self, text, lang=None, rate=None, timeout=None):
+        return self.submit(text, lang, rate).result(timeout=timeout)
+
+    # Identifiant de la voix utilisée pour lang (clé du cache audio), résolu sur le thread
+    # du moteur au premier appel puis mémorisé
+    def voice_id(self, lang=None, timeout=None):
+        code = language_code(lang)
+        if code not in self._voices:
+            future = Future()
+            self._jobs.put((None, lang, None, future))
+            return future.result(timeout=timeout)
+        return self._voices[code]
+
+    def close(self):
+        self._jobs.put(None)
+
+    def _voice_id(self, engine, lang):
+        code = language_code(lang)
+        if code not in self._voices:
+            voice = find_voice(engine.getProperty("voices"), lang)
+            self._voices[code] = voice.id if voice is not None else None
+        return self._voices[code]
+
+    def _run(self):
+        engine = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            text, lang, rate, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            if text is None:
+                try:
+                    if engine is None:
+                        engine = self.engine_factory()
+                    future.set_result(self._voice_id(engine, lang))
+                except Exception as e:
+                    engine = None
+                    future.set_exception(e)
+                continue
+            fd, path = tempfile.mkstemp(suffix=self.suffix, prefix="tts_")
+            os.close(fd)
+            try:
+                if engine is None:
+                    engine = self.engine_factory()
+                engine.setProperty("rate", rate)
+                voice_id = self._voice_id(engine, lang)
+                if voice_id is not None:
+                    engine.setProperty("voice", voice_id)
+                with stage("tts"):
+                    engine.save_to_file(text, path)
+                    engine.runAndWait()
+                with open(path, "rb") as f:
+                    audio = f.read()
+                inc("bytes_total", byte_size(text), stage="tts", direction="in")
+                inc("bytes_total", len(audio), stage="tts", direction="out")
+                future.set_result(audio)
+            except Exception as e:
+                # Un moteur en erreur est recréé pour la demande suivante
+                engine = None
+                future.set_exception(e)
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)